@@ -0,0 +1,293 @@
+"""batch module executing processes of many movies listed in manifest (.toml)
+
+calibration which requires GUI window is selected for every movie first, then
+processes (executed in memory, see stream module) of movies are executed in
+parallel, so that nobody waits for computation between GUI windows.
+
+example of manifest (values in [defaults] are used if not given in [[movie]])::
+
+    [defaults]
+    stages = ["binarize", "measure", "graph"]
+    binarize_threshold = 128
+    calibration = "reuse"
+
+    [[movie]]
+    path = "test1.mp4"
+
+    [[movie]]
+    path = "test2.mp4"
+    type = "binarized"
+    stages = ["measure"]
+
+    [movie.calibration]
+    mm_per_pixel = 0.1
+    bottom = 400
+    tube_pos = [100, 140]
+    threshold = 50
+"""
+import pathlib
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from vibpump import height
+from vibpump import image
+from vibpump import stream
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import tomllib
+except ImportError:  # python < 3.11
+    tomllib = None
+
+# stages available in manifest (order in stages list is kept)
+stage_list = ["capture", "rotate", "crop", "binarize", "measure", "graph"]
+# keys of entry and their default values
+default_entry: Dict[str, Any] = {
+    "path": None,
+    "type": None,
+    "stages": [],
+    "save": [],
+    "degree": None,
+    "area": None,
+    "binarize_threshold": None,
+    "calibration": "reuse",
+    "format": "csv",
+    "batch": 256,
+    "subpixel": 0,
+    "track": 0,
+    "stride": 1,
+    "start": None,
+    "end": None,
+}
+
+
+def load_manifest(manifest: str) -> Dict[str, Any]:
+    """load manifest (.toml)
+
+    tomllib is used if available (python >= 3.11), otherwise toml package is used.
+
+    Args:
+        manifest (str): manifest file
+
+    Returns:
+        Dict[str, Any]: loaded manifest
+    """
+    if tomllib is not None:
+        with open(manifest, "rb") as f:
+            return tomllib.load(f)
+
+    import toml
+
+    with open(manifest) as f:
+        return toml.load(f)
+
+
+def get_entry_list(data: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+    """get entry of each movie filled with default values
+
+    Args:
+        data (Dict[str, Any]): loaded manifest
+
+    Returns:
+        Optional[List[Dict[str, Any]]]: entry of each movie (None if manifest is
+            invalid)
+    """
+    defaults = dict(default_entry)
+    defaults.update(data.get("defaults", {}))
+    entry_list: List[Dict[str, Any]] = []
+
+    for movie in data.get("movie", []):
+        entry = dict(defaults)
+        entry.update(movie)
+
+        unknown = set(entry) - set(default_entry)
+        if unknown:
+            print("unknown key {0} in manifest!".format(sorted(unknown)))
+            return None
+        if entry["path"] is None:
+            print("'path' is required for each [[movie]] in manifest!")
+            return None
+        for stage in entry["stages"]:
+            if stage not in stage_list:
+                print("'{0}' is not available in manifest!".format(stage))
+                return None
+        subpixel = entry["subpixel"]
+        if (subpixel < 0) or (subpixel % 2 == 0 and subpixel != 0):
+            print("'subpixel' must be 0 or positive odd number in manifest!")
+            return None
+
+        entry_list.append(entry)
+
+    return entry_list
+
+
+def get_process_list(entry: Dict[str, Any]) -> Optional[List[stream.Process]]:
+    """get processes executed in memory from entry
+
+    Args:
+        entry (Dict[str, Any]): entry of movie
+
+    Returns:
+        Optional[List[stream.Process]]: list of process name and function
+    """
+    opt_args = [
+        "--" + stage for stage in entry["stages"] if stage not in ["measure", "graph"]
+    ]
+    return stream.get_process_list(
+        opt_args, entry["degree"], entry["area"], entry["binarize_threshold"]
+    )
+
+
+def calibrate(entry: Dict[str, Any]) -> bool:
+    """select calibration of movie (GUI window) and store it before processes
+
+    calibration given as table in manifest is stored without GUI window.
+
+    Args:
+        entry (Dict[str, Any]): entry of movie
+
+    Returns:
+        bool: whether calibration is stored (always True without 'measure')
+    """
+    movie = entry["path"]
+    if "measure" not in entry["stages"]:
+        return True
+
+    if isinstance(entry["calibration"], dict):
+        try:
+            image.save_calibration(movie, image.parse_calibration(entry["calibration"]))
+            return True
+        except (ValueError, KeyError, TypeError, IndexError):
+            print("calibration of '{0}' in manifest is broken!".format(movie))
+            return False
+
+    process_list = get_process_list(entry)
+    if process_list is None:
+        return False
+
+    source = stream.get_source(movie, entry["type"], process_list)
+    if source is None:
+        return False
+
+    frames, key_list, reader, offset = source
+    calibration = image.calibrate(
+        movie,
+        "{0} (batch)".format(movie),
+        key_list,
+        entry["calibration"],
+        reader,
+        offset,
+    )
+    return calibration is not None
+
+
+def run_entry(entry: Dict[str, Any]) -> Tuple[str, float]:
+    """execute processes of movie using stored calibration (no GUI window)
+
+    this is called in worker process.
+
+    Args:
+        entry (Dict[str, Any]): entry of movie
+
+    Returns:
+        Tuple[str, float]: movie and elapsed time (s)
+    """
+    start = time.perf_counter()
+    movie = entry["path"]
+    stages = entry["stages"]
+    process_list = get_process_list(entry)
+    if process_list is None:
+        raise ValueError("processes of '{0}' cannot be executed".format(movie))
+
+    measure_enabled = "measure" in stages
+    if (not process_list) and measure_enabled and (entry["type"] == "binarized"):
+        # measurement of pictures is resumed if it is interrupted
+        directory = str(
+            pathlib.Path.cwd() / "cv2" / pathlib.Path(movie).stem / "binarized"
+        )
+        image.measure(
+            [directory],
+            [movie],
+            entry["batch"],
+            1,
+            "stored",
+            entry["format"],
+            entry["subpixel"],
+            entry["track"],
+            entry["stride"],
+            entry["start"],
+            entry["end"],
+        )
+    elif process_list or measure_enabled:
+        stream.process(
+            [movie],
+            entry["type"],
+            process_list,
+            entry["save"],
+            measure_enabled,
+            "stored",
+            entry["batch"],
+            entry["format"],
+            entry["subpixel"],
+            entry["track"],
+            entry["stride"],
+            entry["start"],
+            entry["end"],
+        )
+
+    if "graph" in stages:
+        height.graph([movie])
+
+    return (movie, time.perf_counter() - start)
+
+
+def run(manifest: str, jobs: int = 1):
+    """execute processes of movies listed in manifest
+
+    Args:
+        manifest (str): manifest file (.toml)
+        jobs (int): number of movies processed in parallel
+    """
+    entry_list = get_entry_list(load_manifest(manifest))
+    if entry_list is None:
+        return
+    if not entry_list:
+        print("no [[movie]] exists in '{0}'!".format(manifest))
+        return
+
+    ready_list: List[Dict[str, Any]] = []
+    for entry in entry_list:
+        if not pathlib.Path(entry["path"]).is_file():
+            print("'{0}' does not exist!".format(entry["path"]))
+        elif calibrate(entry):
+            ready_list.append(entry)
+        else:
+            print("'{0}' is skipped (no calibration)".format(entry["path"]))
+
+    start = time.perf_counter()
+    result_list: List[Tuple[str, Optional[float]]] = []
+
+    with ProcessPoolExecutor(max(jobs, 1)) as executor:
+        future_dict = {executor.submit(run_entry, e): e["path"] for e in ready_list}
+        for idx, future in enumerate(as_completed(future_dict)):
+            movie = future_dict[future]
+            try:
+                movie, elapsed = future.result()
+                print(
+                    "[{0}/{1}] '{2}' finished in {3:.1f} s".format(
+                        idx + 1, len(ready_list), movie, elapsed
+                    )
+                )
+                result_list.append((movie, elapsed))
+            except Exception as e:
+                print(
+                    "[{0}/{1}] '{2}' failed: {3}".format(
+                        idx + 1, len(ready_list), movie, e
+                    )
+                )
+                result_list.append((movie, None))
+
+    print("\nmovie, time (s)")
+    for movie, elapsed in result_list:
+        text = "failed" if elapsed is None else "{0:.1f}".format(elapsed)
+        print("{0}, {1}".format(movie, text))
+    print("total, {0:.1f}".format(time.perf_counter() - start))
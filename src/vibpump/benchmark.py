@@ -0,0 +1,343 @@
+"""benchmark module measuring performance of vibpump commands
+
+hot paths (get_movie_info, measure, graph, etc.) are measured using synthetic movie
+and binarized pictures generated in temporary directory, whose fill level rises
+linearly. results are printed and can be written into .json file to compare among
+versions. (e.g. python -m vibpump.benchmark --output result.json)
+"""
+import argparse
+import cv2
+import json
+import numpy
+import os
+import pathlib
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from vibpump import height
+from vibpump import image
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+
+def time_command(command: List[str], repeat: int) -> List[float]:
+    """measure elapsed time of command executed in new process
+
+    Args:
+        command (List[str]): command and its arguments
+        repeat (int): number of executions
+
+    Returns:
+        List[float]: elapsed time (s) of each execution
+    """
+    time_list = []
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(command, stdout=subprocess.DEVNULL, check=True)
+        time_list.append(time.perf_counter() - start)
+
+    return time_list
+
+
+def measure_startup(
+    args: Optional[List[str]] = None, repeat: int = 10
+) -> Dict[str, Any]:
+    """measure startup latency of vibpump command
+
+    new interpreter is started for each execution, so every module is imported from
+    scratch. bare interpreter startup is measured as baseline.
+
+    Args:
+        args (Optional[List[str]], optional): arguments of vibpump command.
+            Defaults to ["--help"].
+        repeat (int, optional): number of executions. Defaults to 10.
+
+    Returns:
+        Dict[str, Any]: minimum and median latency (s) of command and baseline
+    """
+    if args is None:
+        args = ["--help"]
+
+    command = [sys.executable, "-m", "vibpump.cli"] + args
+    command_list = time_command(command, repeat)
+    baseline_list = time_command([sys.executable, "-c", "pass"], repeat)
+
+    return {
+        "command": " ".join(["vibpump"] + args),
+        "repeat": repeat,
+        "min_s": min(command_list),
+        "median_s": statistics.median(command_list),
+        "baseline_min_s": min(baseline_list),
+        "baseline_median_s": statistics.median(baseline_list),
+    }
+
+
+def get_peak_rss() -> Optional[float]:
+    """get peak resident set size of this process and its children
+
+    Returns:
+        Optional[float]: peak RSS (MB) (None if not available)
+    """
+    if resource is None:
+        return None
+
+    rss = max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    )
+    # ru_maxrss is given in bytes on macOS and in kilobytes on Linux
+    return rss / 2**20 if sys.platform == "darwin" else rss / 2**10
+
+
+def run_stage(func: Callable[[], Any], frames: int = 0) -> Tuple[Dict[str, Any], Any]:
+    """execute one stage and measure its performance
+
+    Args:
+        func (Callable[[], Any]): stage to be executed
+        frames (int, optional): number of frames processed in stage. Defaults to 0.
+
+    Returns:
+        Tuple[Dict[str, Any], Any]: elapsed time (s), frames/s, peak RSS (MB) after
+            stage (peak RSS is the maximum since process started), and return value
+    """
+    start = time.perf_counter()
+    value = func()
+    elapsed = time.perf_counter() - start
+
+    result: Dict[str, Any] = {"time_s": elapsed}
+    if frames:
+        result["frames_per_s"] = frames / elapsed if elapsed else None
+    result["peak_rss_mb"] = get_peak_rss()
+    return (result, value)
+
+
+def create_frame(
+    size: Tuple[int, int], bottom: int, tube_pos: Tuple[int, int], level: int
+) -> numpy.array:
+    """create binarized frame filled up to level in tube area
+
+    Args:
+        size (Tuple[int, int]): size (H, W) of frame
+        bottom (int): bottom line of fill
+        tube_pos (Tuple[int, int]): tube position lines
+        level (int): fill level (pixel) from bottom line
+
+    Returns:
+        numpy.array: cv2 image object (grayscale)
+    """
+    frame = numpy.zeros(size, dtype=numpy.uint8)
+    frame[bottom - level : bottom, tube_pos[0] : tube_pos[1]] = 255
+    return frame
+
+
+def create_pictures(
+    directory: str,
+    level_list: numpy.array,
+    size: Tuple[int, int],
+    bottom: int,
+    tube_pos: Tuple[int, int],
+    fps: float = 30.0,
+):
+    """write binarized pictures named in the same way as stream.save_frames
+
+    Args:
+        directory (str): output directory
+        level_list (numpy.array): fill level (pixel) of each picture
+        size (Tuple[int, int]): size (H, W) of pictures
+        bottom (int): bottom line of fill
+        tube_pos (Tuple[int, int]): tube position lines
+        fps (float, optional): frame rate used for file names. Defaults to 30.0.
+    """
+    pathlib.Path(directory).mkdir(parents=True, exist_ok=True)
+    stem = pathlib.Path(directory).parent.name
+
+    for idx, level in enumerate(level_list):
+        name = "{0}_{1:09d}.png".format(stem, int(round(idx / fps * 1000)))
+        picture = create_frame(size, bottom, tube_pos, level)
+        cv2.imwrite(str(pathlib.Path(directory) / name), picture)
+
+
+def create_movie(
+    movie: str,
+    level_list: numpy.array,
+    size: Tuple[int, int],
+    bottom: int,
+    tube_pos: Tuple[int, int],
+    fps: float = 30.0,
+):
+    """write movie (Motion JPEG) of frames filled up to each level
+
+    Args:
+        movie (str): output movie (.avi)
+        level_list (numpy.array): fill level (pixel) of each frame
+        size (Tuple[int, int]): size (H, W) of movie
+        bottom (int): bottom line of fill
+        tube_pos (Tuple[int, int]): tube position lines
+        fps (float, optional): frame rate. Defaults to 30.0.
+    """
+    fourcc = cv2.VideoWriter_fourcc(*"MJPG")
+    writer = cv2.VideoWriter(movie, fourcc, fps, (size[1], size[0]))
+
+    for level in level_list:
+        frame = create_frame(size, bottom, tube_pos, level)
+        writer.write(cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR))
+
+    writer.release()
+
+
+def measure_hot_paths(
+    frames: int = 1000,
+    size: Tuple[int, int] = (480, 640),
+    batch_size: int = 256,
+    jobs: int = 1,
+) -> Dict[str, Any]:
+    """measure hot paths using synthetic movie and binarized pictures
+
+    every stage is executed in temporary directory (used as current directory),
+    and calibration is stored in advance so that no GUI window is opened.
+
+    Args:
+        frames (int, optional): number of frames. Defaults to 1000.
+        size (Tuple[int, int], optional): size (H, W) of frames.
+            Defaults to (480, 640).
+        batch_size (int, optional): batch size of measure. Defaults to 256.
+        jobs (int, optional): number of processes of measure. Defaults to 1.
+
+    Returns:
+        Dict[str, Any]: condition and result of each stage
+    """
+    cwd = os.getcwd()
+    bottom = size[0] - size[0] // 10
+    tube_pos = (size[1] // 2 - size[1] // 16, size[1] // 2 + size[1] // 16)
+    calibration = {
+        "mm_per_pixel": 0.1,
+        "bottom": bottom,
+        "tube_pos": tube_pos,
+        "threshold": 50,
+    }
+    result: Dict[str, Any] = {
+        "frames": frames,
+        "size": list(size),
+        "batch_size": batch_size,
+        "jobs": jobs,
+    }
+    stage: Dict[str, Any] = {}
+    level_list = numpy.linspace(0, bottom, frames).astype(numpy.int64)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        os.chdir(temp_dir)
+        try:
+            movie = "synthetic.avi"
+            cv2_path = pathlib.Path(pathlib.Path.cwd() / "cv2" / "synthetic")
+            directory = str(cv2_path / "binarized")
+            measured_path = pathlib.Path(cv2_path / "measured")
+
+            stage["create_movie"], _ = run_stage(
+                lambda: create_movie(movie, level_list, size, bottom, tube_pos), frames
+            )
+            stage["create_pictures"], _ = run_stage(
+                lambda: create_pictures(directory, level_list, size, bottom, tube_pos),
+                frames,
+            )
+            image.save_calibration(movie, calibration)
+
+            def get_movie_info():
+                cap = cv2.VideoCapture(movie)
+                info = image.get_movie_info(cap, movie)
+                cap.release()
+                return info
+
+            stage["get_movie_info"], _ = run_stage(get_movie_info, frames)
+            stage["get_movie_info_cached"], _ = run_stage(get_movie_info, frames)
+
+            stage["get_picture_list"], _ = run_stage(
+                lambda: image.get_picture_list(directory), frames
+            )
+            stage["get_picture_list_cached"], _ = run_stage(
+                lambda: image.get_picture_list(directory), frames
+            )
+
+            for output_format in ["csv", "npy"]:
+                name = "synthetic_height.{0}".format(output_format)
+                output = str(measured_path / name)
+                stage["measure_" + output_format], _ = run_stage(
+                    lambda: image.measure(
+                        [directory], [movie], batch_size, jobs, "stored", output_format
+                    ),
+                    frames,
+                )
+                stage["load_height_" + output_format], measured = run_stage(
+                    lambda: height.load_height(output), frames
+                )
+                stage["graph_" + output_format], _ = run_stage(
+                    lambda: height.graph([output]), frames
+                )
+
+            # measured height must be the same as fill level
+            error = numpy.abs(measured[1] - level_list * calibration["mm_per_pixel"])
+            result["max_error_mm"] = float(error.max())
+
+        finally:
+            os.chdir(cwd)
+
+    result["stage"] = stage
+    result["peak_rss_mb"] = get_peak_rss()
+    return result
+
+
+def main():
+    """benchmark main function"""
+    parser = argparse.ArgumentParser(
+        prog="python -m vibpump.benchmark",
+        description="measure cold startup latency of 'vibpump --help' and hot paths",
+    )
+    parser.add_argument(
+        "--suite",
+        choices=["all", "startup", "hot"],
+        default="all",
+        help="benchmark to be executed (default: all)",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=10,
+        help="number of executions of startup (default: 10)",
+    )
+    parser.add_argument(
+        "--frames",
+        type=int,
+        default=1000,
+        help="number of synthetic frames of hot paths (default: 1000)",
+    )
+    parser.add_argument(
+        "--batch", type=int, default=256, help="batch size of measure (default: 256)"
+    )
+    parser.add_argument(
+        "--jobs", type=int, default=1, help="number of processes (default: 1)"
+    )
+    parser.add_argument("--output", help="output .json file")
+    args = parser.parse_args()
+
+    result: Dict[str, Any] = {}
+    if args.suite in ["all", "startup"]:
+        result["startup"] = measure_startup(repeat=args.repeat)
+    if args.suite in ["all", "hot"]:
+        result["hot"] = measure_hot_paths(
+            args.frames, batch_size=args.batch, jobs=args.jobs
+        )
+    print(json.dumps(result, indent=2))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -15,8 +15,6 @@ import imghdr
 import pathlib
 import sys
 from typing import List
-from imgproc import api
-from vibpump import image
 
 
 def call_image_process(args: argparse.Namespace, parser: argparse.ArgumentParser,
@@ -26,8 +24,17 @@ def call_image_process(args: argparse.Namespace, parser: argparse.ArgumentParser
   if not [item for item in items if (item is not None) and (item is not False)]:
     sys.exit(parser.parse_args(["image", "--help"]))
 
+  if (args.subpixel < 0) or (args.subpixel % 2 == 0 and args.subpixel != 0):
+    sys.exit("'--subpixel' must be 0 or positive odd number!")
+
+  calibration_mode = "stored" if args.headless else args.calibration
+
+  # heavy modules (cv2, numpy, etc.) are imported only when processes are executed
+  # so that '-h' is not delayed, and cv2 (which loads GUI libraries) is not imported
+  # for '--graph' and '--analyze' (see height module)
   if {"--binarize", "--capture", "--clip", "--crop", "--measure", "--rotate"
      } & set(opt_args):
+    from vibpump import image
 
     movie_list: List[str] = []
     if args.movie:
@@ -57,22 +64,47 @@ def call_image_process(args: argparse.Namespace, parser: argparse.ArgumentParser
     if not input_data:
       sys.exit("no input exists!")
 
-    for opt in opt_args:
-      if opt == "--binarize":
-        input_data = api.binarize(target_list=input_data)
-      elif opt == "--capture":
-        input_data = api.capture(target_list=input_data)
-      elif opt == "--clip":
-        input_data = api.clip(target_list=input_data)
-      elif opt == "--crop":
-        input_data = api.crop(target_list=input_data)
-      elif opt == "--measure":
-        input_data = image.measure(input_data, movie_list)
-      elif opt == "--rotate":
-        input_data = api.rotate(target_list=input_data)
+    if args.stream:
+      from vibpump import stream
+      process_list = stream.get_process_list(opt_args, args.degree, args.area,
+                                             args.binarize_threshold)
+      if process_list is None:
+        sys.exit("stream mode cannot be executed!")
+      stream.process(movie_list, args.type, process_list, args.save or [],
+                     "--measure" in opt_args, calibration_mode, args.batch,
+                     args.format, args.subpixel, args.track, args.stride,
+                     args.start, args.end)
+    else:
+      gui_list = [opt for opt in opt_args if opt in
+                  ["--binarize", "--capture", "--clip", "--crop", "--rotate"]]
+      if args.headless and gui_list:
+        sys.exit("{0} requires GUI window (use '--stream' in '--headless')".format(
+            ", ".join(gui_list)))
+
+      from imgproc import api
+      for opt in opt_args:
+        if opt == "--binarize":
+          input_data = api.binarize(target_list=input_data)
+        elif opt == "--capture":
+          input_data = api.capture(target_list=input_data)
+        elif opt == "--clip":
+          input_data = api.clip(target_list=input_data)
+        elif opt == "--crop":
+          input_data = api.crop(target_list=input_data)
+        elif opt == "--measure":
+          input_data = image.measure(input_data, movie_list, args.batch, args.jobs,
+                                     calibration_mode, args.format, args.subpixel,
+                                     args.track, args.stride, args.start, args.end)
+        elif opt == "--rotate":
+          input_data = api.rotate(target_list=input_data)
 
   if set(["--graph"]) & set(opt_args):
-    image.graph(args.movie)
+    from vibpump import height
+    height.graph(args.movie, args.jobs)
+
+  if set(["--analyze"]) & set(opt_args):
+    from vibpump import height
+    height.analyze(args.movie, args.pump_frequency, args.fill_percent, args.jobs)
 
 
 def cli_execution():
@@ -84,7 +116,8 @@ def cli_execution():
       "output is generated in 'cv2' directory under current location.\n" +
       "if multiple processes are selected, input data is processed continuously\n" +
       "in order of argument. (output in one process is given to the next process.)\n" +
-      "'--graph' process is exceptional and executed at the end.\n\n" +
+      "'--graph' and '--analyze' processes are exceptional and executed at the\n" +
+      "end.\n\n" +
       "'--movie' option means path of movie.\n" +
       "if '--type' is not selected, movie file itself is given as input.\n" +
       "if '--type' option is selected, pre-processed data for the movie in 'cv2'\n" +
@@ -92,10 +125,12 @@ def cli_execution():
       "if pre-processed data does not exist, image process is not executed.\n\n" +
       "whether '--type' is selected or not, movie file itself must exist.\n" +
       "if it does not exist, image process is not executed except for '--graph'.\n" +
-      "'--measure' creates '**_height.csv' that can be given only to '--graph',.\n" +
+      "'--measure' creates '**_height.csv' (or '**_height.npy' with '--format npy')\n" +
+      "that can be given only to '--graph',.\n" +
       "visualizing .csv file. if multiple '**_height.csv' are given,\n" +
       "'--graph' creates one figure containing multiple data in 'cv2' directory.\n\n" +
-      "(see sub-option 'vibpump image -h')\n",
+      "(see sub-option 'vibpump image -h')\n\n" +
+      "many movies can be processed using manifest. (see 'vibpump run -h')\n",
   )
 
   parser.set_defaults(call=call_image_process)
@@ -114,6 +149,15 @@ def cli_execution():
       "if selected, the pre-processed directory of movie in 'cv2' direcotry\n" +
       "under current location is given as input.\n",
   )
+  parser.add_argument(
+      "--analyze",
+      action="store_true",
+      help="to analyze measured data, requiring csv (or npy) file in 'cv2'\n" +
+      "directory. this creates 'cv2/analysis.csv' containing one row for\n" +
+      "each movie: steady height, climbing rate, time to reach\n" +
+      "'--fill-percent' of steady height, and amplitude of oscillation\n" +
+      "(dominant and pump frequency).\n",
+  )
   parser.add_argument(
       "--binarize",
       action="store_true",
@@ -146,13 +190,147 @@ def cli_execution():
       action="store_true",
       help="to measure climbing height, requiring 'binarized' type input\n" +
       "this creates .csv file in 'cv2' directory, and output file name is decided\n" +
-      "using first movie file name. this should be executed just after 'binarize'.\n",
+      "using first movie file name. this should be executed just after 'binarize'.\n" +
+      "with '--stream --binarize', height is measured directly from movie, and\n" +
+      "only tube area of each frame is binarized in memory.\n",
   )
   parser.add_argument(
       "--rotate",
       action="store_true",
       help="to enable rotate process" + "\n ",
   )
+  parser.add_argument(
+      "--calibration",
+      choices=["reuse", "force"],
+      default="force",
+      help="how calibration (mm/pixel, reference lines, threshold) is given\n" +
+      "in '--measure'. selected calibration is stored in 'cv2' directory.\n" +
+      "reuse: stored calibration is used without GUI window if it exists.\n" +
+      "force: calibration is always selected using GUI window. (default)\n",
+  )
+  parser.add_argument(
+      "--format",
+      choices=["csv", "npy"],
+      default="csv",
+      help="output format of '--measure' ('--graph' reads both formats)\n" +
+      "csv: '**_height.csv' text file. (default)\n" +
+      "npy: '**_height.npy' (N, 2) float64 array of time and height,\n" +
+      "which is much faster to write and read, and can be memory-mapped.\n",
+  )
+  parser.add_argument(
+      "--subpixel",
+      type=int,
+      default=0,
+      metavar="ROWS",
+      help="to detect height in sub-pixel in '--measure' (disabled if 0)\n" +
+      "white area %% of rows is smoothed over ROWS (odd) rows (e.g. 5),\n" +
+      "ignoring isolated speckle rows, and threshold crossing is\n" +
+      "interpolated. 1 gives interpolation only. (default: 0)\n",
+  )
+  parser.add_argument(
+      "--track",
+      type=int,
+      default=0,
+      metavar="ROWS",
+      help="to search height only in band of +-ROWS rows in '--measure'\n" +
+      "band follows height of the previous frames (every 16 frames), and\n" +
+      "frames not found in band are searched in whole frame. (default: 0)\n",
+  )
+  parser.add_argument(
+      "--stride",
+      type=int,
+      default=1,
+      metavar="N",
+      help="to measure every N-th frame in '--measure' (and '--stream')\n" +
+      "frames not selected are never read (default: 1)\n",
+  )
+  parser.add_argument(
+      "--start",
+      type=float,
+      metavar="sec",
+      help="start time of frames in '--measure' (and '--stream')\n ",
+  )
+  parser.add_argument(
+      "--end",
+      type=float,
+      metavar="sec",
+      help="end time of frames in '--measure' (and '--stream')\n ",
+  )
+  parser.add_argument(
+      "--batch",
+      type=int,
+      default=256,
+      metavar="N",
+      help="number of pictures loaded and measured at once in '--measure'\n" +
+      "larger value is faster, but requires more memory. (default: 256)\n",
+  )
+  parser.add_argument(
+      "--jobs",
+      type=int,
+      default=1,
+      metavar="N",
+      help="number of processes measuring pictures in parallel in '--measure'\n" +
+      "pictures are measured after reference lines are selected.\n" +
+      "in '--graph', figures are rendered in parallel. (default: 1)\n",
+  )
+  parser.add_argument(
+      "--pump-frequency",
+      type=float,
+      metavar="Hz",
+      help="pump frequency whose amplitude is analyzed in '--analyze'\n ",
+  )
+  parser.add_argument(
+      "--fill-percent",
+      nargs="+",
+      type=float,
+      default=[50.0, 90.0],
+      metavar="X",
+      help="%% of steady height whose reaching time is analyzed in '--analyze'\n" +
+      "(default: 50 90)\n",
+  )
+  parser.add_argument(
+      "--headless",
+      action="store_true",
+      help="to execute without GUI window (e.g. node without display)\n" +
+      "'--graph' and '--analyze' never load GUI libraries (cv2), and\n" +
+      "'--measure' uses only stored calibration (see '--calibration').\n" +
+      "other processes are available only with '--stream'.\n",
+  )
+  parser.add_argument(
+      "--stream",
+      action="store_true",
+      help="to execute processes in memory (frames are given to the next process\n" +
+      "without being written). only output of the last process and processes\n" +
+      "selected by '--save' is written. '--clip' is not supported.\n" +
+      "'--rotate', '--crop', '--binarize' require '--degree', '--area',\n" +
+      "'--binarize-threshold' respectively.\n",
+  )
+  parser.add_argument(
+      "--save",
+      nargs="*",
+      choices=["binarized", "captured", "cropped", "rotated"],
+      help="output type written in '--stream' (output of the last process is\n" +
+      "always written. if '--measure' is the last, only .csv file is written.)\n",
+  )
+  parser.add_argument(
+      "--degree",
+      type=float,
+      metavar="deg",
+      help="rotation angle (counterclockwise) for '--rotate' in '--stream'\n ",
+  )
+  parser.add_argument(
+      "--area",
+      nargs=4,
+      type=int,
+      metavar=("x1", "y1", "x2", "y2"),
+      help="area (upper left and lower right) for '--crop' in '--stream'\n ",
+  )
+  parser.add_argument(
+      "--binarize-threshold",
+      type=int,
+      metavar="0-255",
+      help="threshold of binarization for '--binarize' in '--stream'\n ",
+  )
 
   if len(sys.argv) <= 1:
     sys.exit(parser.format_help())
@@ -161,9 +339,36 @@ def cli_execution():
   args.call(args, parser, sys.argv[2:])
 
 
+def run_execution():
+  """read, parse, and execute cli arguments of 'vibpump run'"""
+  parser = argparse.ArgumentParser(
+      prog="vibpump.py run",
+      formatter_class=argparse.RawTextHelpFormatter,
+      description="execute processes of movies listed in manifest (.toml).\n\n" +
+      "calibration of every movie is selected using GUI window first (or given in\n" +
+      "manifest), then processes are executed in memory (same as '--stream')\n" +
+      "for movies in parallel. (see vibpump.batch module for manifest format)\n",
+  )
+  parser.add_argument("manifest", help="manifest file (.toml)\n ")
+  parser.add_argument(
+      "--jobs",
+      type=int,
+      default=1,
+      metavar="N",
+      help="number of movies processed in parallel (default: 1)\n",
+  )
+  args = parser.parse_args(sys.argv[2:])
+
+  from vibpump import batch
+  batch.run(args.manifest, args.jobs)
+
+
 def main() -> None:
   """cli command main function"""
-  cli_execution()
+  if (2 <= len(sys.argv)) and (sys.argv[1] == "run"):
+    run_execution()
+  else:
+    cli_execution()
 
 
 if __name__ == "__main__":
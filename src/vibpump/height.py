@@ -0,0 +1,541 @@
+"""height module containing functions of measured height (file, graph, analysis)
+
+this module does not import cv2 (and GUI libraries loaded with it), so that graph
+and analysis can be executed on machine without display.
+"""
+import csv
+import functools
+import imghdr
+import inspect
+import numpy
+import pathlib
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+def save_height(
+    output: str,
+    result_list: Iterable[Tuple[List[float], List[float]]],
+    append: bool = False,
+):
+    """write measured height into .csv or .npy file
+
+    .csv file is written while results are given. .npy file contains (N, 2)
+    float64 array of time (s) and height (mm), which can be memory-mapped.
+
+    Args:
+        output (str): output file (_height.csv or _height.npy)
+        result_list (Iterable[Tuple[List[float], List[float]]]): time (s) and
+            height (mm) given chunk by chunk
+        append (bool): whether results are added to existing output
+    """
+    if pathlib.Path(output).suffix == ".npy":
+        array_list = [numpy.column_stack(result) for result in result_list]
+        if append:
+            array_list.insert(0, numpy.load(output))
+        if array_list:
+            data = numpy.concatenate(array_list).astype(numpy.float64)
+        else:
+            data = numpy.empty((0, 2), dtype=numpy.float64)
+        numpy.save(output, data)
+        return
+
+    with open(output, "a" if append else "w", newline="") as f:
+
+        w = csv.writer(f)
+        if not append:
+            w.writerow(["time_s", "height_mm"])
+
+        for time_list, height_list in result_list:
+            w.writerows(zip(time_list, height_list))
+            # measured chunk is kept even if process is killed
+            f.flush()
+
+
+def sort_height(output: str):
+    """sort measured height in time order (after missing frames are appended)
+
+    Args:
+        output (str): output file (_height.csv or _height.npy)
+    """
+    if pathlib.Path(output).suffix == ".npy":
+        # .npy file is loaded without memory-mapping since it is overwritten
+        data = numpy.load(output)
+        time_list, height_list = data[:, 0], data[:, 1]
+    else:
+        time_list, height_list = load_height(output)
+    order = numpy.argsort(time_list, kind="stable")
+    save_height(output, [(time_list[order], height_list[order])])
+
+
+def get_measured_time(output: str) -> Optional[numpy.array]:
+    """get time of frames already measured in output to resume measurement
+
+    last line of .csv file which is not terminated (process was killed while
+    writing) is removed.
+
+    Args:
+        output (str): output file (_height.csv or _height.npy)
+
+    Returns:
+        Optional[numpy.array]: time (s) of measured frames (None if output is
+            not found or broken)
+    """
+    output_path = pathlib.Path(output)
+    if not output_path.is_file():
+        return None
+
+    if output_path.suffix == ".csv":
+        text = output_path.read_bytes()
+        end = text.rfind(b"\n") + 1
+        if end == 0:
+            return None
+        if end < len(text):
+            with open(output, "r+b") as f:
+                f.truncate(end)
+
+    try:
+        time_list, height_list = load_height(output)
+        return numpy.array(time_list)
+    except (ValueError, IndexError, OSError):
+        print("'{0}' is broken!".format(output))
+        return None
+
+
+def get_time_ms(time_list: Any) -> numpy.array:
+    """get time rounded to integer ms, which is used to compare time of frames
+
+    Args:
+        time_list (Any): time (s) of frames
+
+    Returns:
+        numpy.array: time (ms, int64)
+    """
+    return numpy.round(numpy.asarray(time_list, dtype=numpy.float64) * 1000).astype(
+        numpy.int64
+    )
+
+
+def load_height(file_name: str) -> Tuple[numpy.array, numpy.array]:
+    """read measured height from .csv or .npy file
+
+    Args:
+        file_name (str): _height.csv or _height.npy file
+
+    Returns:
+        Tuple[numpy.array, numpy.array]: time (s) and height (mm)
+    """
+    if pathlib.Path(file_name).suffix == ".npy":
+        data = numpy.load(file_name, mmap_mode="r")
+        return (data[:, 0], data[:, 1])
+
+    # header only file is valid (no frame measured), so empty warning is ignored
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", UserWarning)
+        data = numpy.loadtxt(
+            file_name, delimiter=",", skiprows=1, usecols=(0, 1), ndmin=2
+        )
+
+    return (data[:, 0], data[:, 1])
+
+
+def get_height_list(movie_list: List[str]) -> List[str]:
+    """get measured height files of movies
+
+    Args:
+        movie_list (List[str]): movie files or _height.csv / _height.npy files
+
+    Returns:
+        List[str]: _height.csv / _height.npy files
+    """
+    cv2_path = pathlib.Path(pathlib.Path.cwd() / "cv2")
+    input_list: List[str] = []
+
+    for movie in movie_list:
+
+        is_height = ("_height.csv" in movie) or ("_height.npy" in movie)
+        if is_height and (pathlib.Path(movie).is_file()):
+            input_list.append(movie)
+
+        else:
+            movie_path = pathlib.Path(movie)
+            movie_stem = movie_path.stem
+
+            if (movie_path.is_file()) and (imghdr.what(movie) is None):
+                # the latest file is used if both .npy and .csv exist
+                path_list = [
+                    pathlib.Path(
+                        cv2_path / movie_stem / "measured" / (movie_stem + height_file)
+                    )
+                    for height_file in ["_height.npy", "_height.csv"]
+                ]
+                path_list = [p for p in path_list if p.is_file()]
+                if path_list:
+                    latest = max(path_list, key=lambda p: p.stat().st_mtime_ns)
+                    input_list.append(str(latest))
+
+    return input_list
+
+
+def graph(movie_list: List[str], jobs: int = 1):
+    """visualize measured height
+
+    Args:
+        movie_list (List[str]): movie files or _height.csv / _height.npy files
+        jobs (int, optional): number of processes rendering figures, one figure for
+            one process. Defaults to 1.
+    """
+    input_list = get_height_list(movie_list)
+
+    if jobs > 1:
+        with ProcessPoolExecutor(jobs) as executor:
+            future_list = [executor.submit(graph_single, i) for i in input_list]
+            if len(input_list) >= 2:
+                future_list.append(executor.submit(graph_multiple, input_list))
+            for future in future_list:
+                future.result()
+        return
+
+    for input in input_list:
+        graph_single(input)
+
+    if len(input_list) >= 2:
+        graph_multiple(input_list)
+
+
+def analyze(
+    movie_list: List[str],
+    frequency: Optional[float] = None,
+    percent_list: Optional[List[float]] = None,
+    jobs: int = 1,
+) -> Optional[str]:
+    """analyze measured height of movies and write summary table
+
+    one row of 'cv2/analysis.csv' is written for each height file.
+    (see analyze_height for columns)
+
+    Args:
+        movie_list (List[str]): movie files or _height.csv / _height.npy files
+        frequency (Optional[float], optional): pump frequency (Hz). Defaults to None.
+        percent_list (Optional[List[float]], optional): % of steady height whose
+            reaching time is analyzed. Defaults to [50, 90].
+        jobs (int, optional): number of processes analyzing files. Defaults to 1.
+
+    Returns:
+        Optional[str]: summary table (None if no height file exists)
+    """
+    input_list = get_height_list(movie_list)
+    if not input_list:
+        print("no measured height exists!")
+        return None
+
+    if percent_list is None:
+        percent_list = [50.0, 90.0]
+    analyze_file = functools.partial(
+        analyze_height_file, frequency=frequency, percent_list=percent_list
+    )
+
+    if jobs > 1:
+        with ProcessPoolExecutor(jobs) as executor:
+            result_list = list(executor.map(analyze_file, input_list))
+    else:
+        result_list = list(map(analyze_file, input_list))
+
+    output = str(pathlib.Path(pathlib.Path.cwd() / "cv2" / "analysis.csv"))
+    pathlib.Path(output).parent.mkdir(parents=True, exist_ok=True)
+
+    with open(output, "w", newline="") as f:
+
+        w = csv.writer(f)
+        header = ["file"] + list(analyze_height([], [], frequency, percent_list))
+        w.writerow(header)
+
+        # file which cannot be analyzed is written as row of NaN
+        for input, result in zip(input_list, result_list):
+            if result is None:
+                w.writerow([input] + [float("nan")] * (len(header) - 1))
+            else:
+                w.writerow([input] + [result[key] for key in header[1:]])
+
+    print("summary of {0} files is written in '{1}'".format(len(input_list), output))
+    return output
+
+
+def analyze_height_file(
+    file_name: str, frequency: Optional[float], percent_list: List[float]
+) -> Optional[Dict[str, float]]:
+    """analyze measured height file (see analyze_height)
+
+    this is also called in worker process when files are analyzed in parallel.
+
+    Args:
+        file_name (str): _height.csv or _height.npy file
+        frequency (Optional[float]): pump frequency (Hz)
+        percent_list (List[float]): % of steady height whose reaching time is analyzed
+
+    Returns:
+        Optional[Dict[str, float]]: result of analysis (None if file cannot be
+            analyzed)
+    """
+    try:
+        time_list, height_list = load_height(file_name)
+        return analyze_height(time_list, height_list, frequency, percent_list)
+    except Exception as e:
+        print("'{0}' cannot be analyzed! ({1})".format(file_name, e))
+        return None
+
+
+def analyze_height(
+    time_list: numpy.array,
+    height_list: numpy.array,
+    frequency: Optional[float] = None,
+    percent_list: Optional[List[float]] = None,
+    steady: float = 0.2,
+) -> Dict[str, float]:
+    """analyze climbing of measured height and its oscillation
+
+    steady height is the mean of the last `steady` fraction of duration.
+    climbing rate is slope of linear fit between 10% and 90% of steady height.
+    spectrum of oscillation in steady state is calculated by FFT (Hann window)
+    after resampling at the median interval, and amplitude is given in mm.
+    samples within the same ms are averaged before resampling.
+    value which cannot be calculated is NaN.
+
+    Args:
+        time_list (numpy.array): time (s)
+        height_list (numpy.array): height (mm)
+        frequency (Optional[float], optional): pump frequency (Hz) whose amplitude
+            is given. Defaults to None.
+        percent_list (Optional[List[float]], optional): % of steady height whose
+            reaching time (from the first sample) is given. Defaults to [50, 90].
+        steady (float, optional): fraction of duration regarded as steady state.
+            Defaults to 0.2.
+
+    Returns:
+        Dict[str, float]: samples, duration_s, steady_height_mm, climbing_rate_mm_s,
+            time_to_X%_s, dominant_hz, dominant_amplitude_mm, pump_hz,
+            pump_amplitude_mm
+    """
+    if percent_list is None:
+        percent_list = [50.0, 90.0]
+
+    time = numpy.asarray(time_list, dtype=numpy.float64)
+    height = numpy.asarray(height_list, dtype=numpy.float64)
+    nan = float("nan")
+    result: Dict[str, float] = {
+        "samples": len(time),
+        "duration_s": nan,
+        "steady_height_mm": nan,
+        "climbing_rate_mm_s": nan,
+    }
+    for percent in percent_list:
+        result["time_to_{0:g}%_s".format(percent)] = nan
+    result.update(
+        {
+            "dominant_hz": nan,
+            "dominant_amplitude_mm": nan,
+            "pump_hz": nan if frequency is None else frequency,
+            "pump_amplitude_mm": nan,
+        }
+    )
+    if not len(time):
+        return result
+
+    duration = time[-1] - time[0]
+    tail = time >= time[-1] - steady * duration
+    steady_height = height[tail].mean()
+    result["duration_s"] = duration
+    result["steady_height_mm"] = steady_height
+
+    if 0 < steady_height:
+        # the first sample reaching each level is found at once
+        level = numpy.array([10.0, 90.0] + list(percent_list)) * 0.01 * steady_height
+        reached = level[:, numpy.newaxis] <= height
+        index = numpy.argmax(reached, axis=1)
+        found = reached[numpy.arange(len(level)), index]
+
+        for idx, percent in enumerate(percent_list):
+            if found[idx + 2]:
+                key = "time_to_{0:g}%_s".format(percent)
+                result[key] = time[index[idx + 2]] - time[0]
+
+        lower, upper = index[0], index[1]
+        if found[0] and found[1] and (2 <= upper - lower):
+            slope, intercept = numpy.polyfit(
+                time[lower : upper + 1], height[lower : upper + 1], 1
+            )
+            result["climbing_rate_mm_s"] = slope
+
+    # samples of the same time (in ms) are averaged not to make interval zero
+    inverse = numpy.unique(get_time_ms(time[tail]), return_inverse=True)[1]
+    count = numpy.bincount(inverse)
+    t = numpy.bincount(inverse, time[tail]) / count
+    h = numpy.bincount(inverse, height[tail]) / count
+    dt = numpy.median(numpy.diff(t)) if 2 <= len(t) else 0.0
+    if (4 <= len(t)) and (0 < dt):
+        n = int((t[-1] - t[0]) / dt) + 1
+        grid = t[0] + numpy.arange(n) * dt
+        signal = numpy.interp(grid, t, h)
+        window = numpy.hanning(n)
+        spectrum = numpy.abs(numpy.fft.rfft((signal - signal.mean()) * window))
+        spectrum *= 2.0 / window.sum()
+        freq = numpy.fft.rfftfreq(n, dt)
+
+        if (2 <= len(spectrum)) and (0 < spectrum[1:].max()):
+            peak = numpy.argmax(spectrum[1:]) + 1
+            result["dominant_hz"] = freq[peak]
+            result["dominant_amplitude_mm"] = spectrum[peak]
+        if (frequency is not None) and (0 < frequency <= freq[-1]):
+            # peak is searched in neighboring bins (leakage of window)
+            idx = int(numpy.argmin(numpy.abs(freq - frequency)))
+            result["pump_amplitude_mm"] = spectrum[max(idx - 1, 0) : idx + 2].max()
+
+    return result
+
+
+def decimate_height(
+    time_list: numpy.array, height_list: numpy.array, size: int = 2000
+) -> Tuple[numpy.array, numpy.array]:
+    """reduce samples to be plotted keeping minimum and maximum of each bucket
+
+    Figure is 4.5 inch width at 300 dpi, so more than a few thousands of points
+    are drawn on the same pixels. Samples are split into `size` buckets and only
+    minimum and maximum of each bucket are kept in time order with the first
+    and the last samples, so peaks and time range remain.
+
+    Args:
+        time_list (numpy.array): time (s)
+        height_list (numpy.array): height (mm)
+        size (int, optional): number of buckets. Defaults to 2000.
+
+    Returns:
+        Tuple[numpy.array, numpy.array]: decimated time (s) and height (mm)
+    """
+    n = len(height_list)
+    if n <= 2 * size:
+        return (time_list, height_list)
+
+    step = -(-n // size)
+    m = n // step * step
+    bucket = numpy.asarray(height_list[:m]).reshape(-1, step)
+    offset = numpy.arange(0, m, step)
+    index = numpy.concatenate(
+        [
+            [0],
+            offset + bucket.argmin(axis=1),
+            offset + bucket.argmax(axis=1),
+            numpy.arange(m, n),
+            [n - 1],
+        ]
+    )
+    index = numpy.unique(index)
+
+    return (numpy.asarray(time_list)[index], numpy.asarray(height_list)[index])
+
+
+def graph_multiple(input_list):
+    """visualize measured height"""
+    from matplotlib.figure import Figure
+
+    fig_stem = "__".join(
+        [pathlib.Path(i).stem.strip("_height")[:10] for i in input_list]
+    )
+    fig_name = pathlib.Path(pathlib.Path.cwd() / "cv2" / "{0}.png".format(fig_stem))
+
+    # Figure is used instead of pyplot not to share global state among processes
+    fig = Figure(figsize=(4.5, 3), dpi=300)
+    ax = fig.add_subplot()
+
+    for input in input_list:
+
+        time_list, height_list = load_height(input)
+
+        if not len(time_list):
+            print("no data exists in {0}!".format(input))
+            return
+
+        time_list, height_list = decimate_height(time_list, height_list)
+        label_name = pathlib.Path(input).stem.strip("_height")
+        ax.plot(time_list, height_list, label=label_name)
+
+    ax.tick_params(which="both", direction="in")
+    ax.set_xlabel("time  $\\it{s}$")
+    ax.set_ylabel("climbing height $\\it{mm}$")
+    ax.set_xlim(xmin=0)
+    # ax.set_xticks([0, 100, 200, 300])
+    ax.set_ylim(ymin=0)
+    # ax.set_yticks([0, 250, 500, 750, 1000])
+    ax.grid(which="minor")
+    ax.legend(bbox_to_anchor=(1, 1.01), loc="lower right", borderaxespad=0)
+    fig.savefig(fig_name, bbox_inches="tight")
+    generate_script_multiple_data(input_list)
+
+
+def graph_single(input):
+    """visualize measured height"""
+    from matplotlib.figure import Figure
+
+    file_name = input
+    # figure of .npy file is named with format not to overwrite that of .csv file
+    file_path = pathlib.Path(file_name)
+    fig_stem = file_path.stem + ("_npy" if file_path.suffix == ".npy" else "")
+    fig_name = str(file_path.with_name(fig_stem + ".png"))
+
+    time_list, height_list = load_height(file_name)
+
+    if not len(time_list):
+        print("no data exists in {0}!".format(file_name))
+        return
+
+    time_list, height_list = decimate_height(time_list, height_list)
+    # Figure is used instead of pyplot not to share global state among processes
+    fig = Figure(figsize=(4.5, 3), dpi=300)
+    ax = fig.add_subplot()
+    ax.plot(time_list, height_list)
+    ax.tick_params(which="both", direction="in")
+    ax.set_xlabel("time  $\\it{s}$")
+    ax.set_ylabel("climbing height $\\it{mm}$")
+    ax.set_xlim(xmin=0)
+    # ax.set_xticks([0, 100, 200, 300])
+    ax.set_ylim(ymin=0)
+    # ax.set_yticks([0, 250, 500, 750, 1000])
+    ax.grid(which="minor")
+    fig.savefig(fig_name, bbox_inches="tight")
+    generate_script_single_data(file_name)
+
+
+def generate_script_multiple_data(file_list: List[str]):
+
+    text_1 = "import numpy\nimport pathlib\nimport warnings\n"
+    text_1 += "from typing import Tuple\n\n\n"
+    text_1 += inspect.getsource(load_height) + "\n\n"
+    text_1 += inspect.getsource(decimate_height) + "\n\n"
+    text_1 += inspect.getsource(graph_multiple)
+    text_2 = text_1.rstrip("generate_script_multiple_data(input_list)\n")
+    text_2 += "\n\ninput_list = ["
+    for file in file_list:
+        text_2 += "\n  r'{0}',".format(file)
+    text_2 += "\n]"
+    text_2 += "\ngraph_multiple(input_list)\n"
+    fig_stem = "__".join(
+        [pathlib.Path(f).stem.strip("_height")[:10] for f in file_list]
+    )
+    helper_path = pathlib.Path(pathlib.Path.cwd() / "cv2" / "{0}.py".format(fig_stem))
+    helper_path.write_text(text_2)
+
+
+def generate_script_single_data(file: str):
+
+    text_1 = "import numpy\nimport pathlib\nimport warnings\n"
+    text_1 += "from typing import Tuple\n\n\n"
+    text_1 += inspect.getsource(load_height) + "\n\n"
+    text_1 += inspect.getsource(decimate_height) + "\n\n"
+    text_1 += inspect.getsource(graph_single)
+    text_2 = text_1.rstrip("generate_script_single_data(file_name)\n")
+    text_3 = text_2 + "\n\ninput = r'{0}'".format(file)
+    text_4 = text_3 + "\ngraph_single(input)"
+    file_path = pathlib.Path(file)
+    helper_stem = file_path.stem + ("_npy" if file_path.suffix == ".npy" else "")
+    helper_path = file_path.with_name(helper_stem + ".py")
+    helper_path.write_text(text_4 + "\n")
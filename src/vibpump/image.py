@@ -1,18 +1,29 @@
 """image module containing image process functions
 """
-import csv
 import cv2
+import functools
 import imghdr
-import inspect
+import json
 import numpy
 import math
 import pathlib
 import re
-import matplotlib
-
-matplotlib.use("tkagg")
-from matplotlib import pyplot
-from typing import List, Tuple, Optional
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from vibpump import height
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
 
 
 def add_texts(image: numpy.array, texts: List[str], position: Tuple[int, int]):
@@ -79,10 +90,121 @@ def add_texts_lower_right(image: numpy.array, texts: List[str]):
 
 
 def mouse_on_select_positions(event, x, y, flags, params):
-    """call back function on mouse click"""
-    points = params
+    """call back function on mouse click
+
+    params is tuple of selected points and scale of shown (downscaled) image.
+    clicked position is stored in scale of original image.
+    """
+    points, scale = params
     if event == cv2.EVENT_LBUTTONUP:
-        points.append((x, y))
+        points.append(scale_point((x, y), 1.0 / scale))
+
+
+def scale_point(point: Tuple[int, int], scale: float) -> Tuple[int, int]:
+    """scale pixel position (center of pixel is kept)
+
+    Args:
+        point (Tuple[int, int]): pixel position
+        scale (float): scale
+
+    Returns:
+        Tuple[int, int]: scaled pixel position
+    """
+    return (
+        int(round((point[0] + 0.5) * scale - 0.5)),
+        int(round((point[1] + 0.5) * scale - 0.5)),
+    )
+
+
+def get_proxy_scale(W: int, H: int, size: int = 1280) -> float:
+    """get scale of proxy image shown in GUI window instead of original image
+
+    Args:
+        W (int): width of original image
+        H (int): height of original image
+        size (int): upper limit of width and height of proxy image
+
+    Returns:
+        float: scale of proxy image (1.0 if original image is small enough)
+    """
+    return min(1.0, size / max(W, H, 1))
+
+
+def get_window_scale(
+    window: str, W: int, H: int, full: bool = False, size: int = 1280
+) -> float:
+    """get scale of proxy image which is not smaller than image area of window
+
+    proxy image is enlarged with window (in steps of 1/8), so that clicked position
+    is as precise as original image shown in the same window. original image is
+    used if full is True (e.g. to zoom in using toolbar of window).
+
+    Args:
+        window (str): window name
+        W (int): width of original image
+        H (int): height of original image
+        full (bool): whether original image is used
+        size (int): upper limit of width and height of proxy image of small window
+
+    Returns:
+        float: scale of proxy image
+    """
+    scale = get_proxy_scale(W, H, size)
+    if full or scale == 1.0:
+        return 1.0
+
+    try:
+        x, y, w, h = cv2.getWindowImageRect(window)
+    except cv2.error:
+        return scale
+    if (0 < w) and (0 < h):
+        scale_window = math.ceil(max(w / max(W, 1), h / max(H, 1)) * 8) / 8
+        scale = max(scale, min(scale_window, 1.0))
+    return scale
+
+
+def start_frame_cache(
+    window: str,
+    points: List[Tuple[int, int]],
+    loader: Callable[..., Optional[numpy.array]],
+    scale: float,
+) -> "FrameCache":
+    """start cache of proxy images and set mouse callback of window for the scale
+
+    Args:
+        window (str): window name
+        points (List[Tuple[int, int]]): selected points (in scale of original image)
+        loader (Callable[..., Optional[numpy.array]]): function reading frame from
+            key and 'scale' keyword
+        scale (float): scale of proxy image
+
+    Returns:
+        FrameCache: started cache
+    """
+    cv2.setMouseCallback(window, mouse_on_select_positions, (points, scale))
+    frame_cache = FrameCache(functools.partial(loader, scale=scale))
+    frame_cache.start()
+    return frame_cache
+
+
+def resize_proxy(
+    image: numpy.array, scale: float, interpolation: int = cv2.INTER_AREA
+) -> numpy.array:
+    """resize image to proxy image
+
+    Args:
+        image (numpy.array): cv2 image object
+        scale (float): scale of proxy image
+        interpolation (int): cv2 interpolation flag
+
+    Returns:
+        numpy.array: proxy image
+    """
+    if scale == 1.0:
+        return image
+    H, W = image.shape[0], image.shape[1]
+    size = (max(int(round(W * scale)), 1), max(int(round(H * scale)), 1))
+    return cv2.resize(image, size, interpolation=interpolation)
 
 
 def no(no):
@@ -90,15 +212,217 @@ def no(no):
     pass
 
 
-def get_movie_info(cap: cv2.VideoCapture) -> Tuple[int, int, int, float]:
+class FrameCache:
+    """bounded LRU cache of decoded frames used in GUI window
+
+    frames are given by loader with key (frame number of movie or picture path),
+    and least recently used frames are discarded when total size exceeds limit.
+    after start() is called, frames are read only in background thread, which
+    reads requested frame first, then frames given by prefetch(). exception raised
+    by loader in background thread is raised again by get().
+
+    Args:
+        loader (Callable[[Any], numpy.array]): function reading frame from key
+        max_bytes (int): upper limit of total size of cached frames
+    """
+
+    def __init__(self, loader: Callable[[Any], numpy.array], max_bytes: int = 2 ** 28):
+        self.loader = loader
+        self.max_bytes = max_bytes
+        self.frames: "OrderedDict[Any, numpy.array]" = OrderedDict()
+        self.failed: Set[Any] = set()
+        self.errors: Dict[Any, Exception] = {}
+        self.total_bytes = 0
+        self.frame_bytes = 0
+        self.requested: List[Any] = []
+        self.prefetch_list: List[Any] = []
+        self.prefetch_count = 0
+        self.condition = threading.Condition()
+        self.thread: Optional[threading.Thread] = None
+        self.stopped = False
+
+    def start(self):
+        """start background thread reading frames"""
+        self.stopped = False
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """stop background thread reading frames"""
+        if self.thread is None:
+            return
+        with self.condition:
+            self.stopped = True
+            self.condition.notify_all()
+        self.thread.join()
+        self.thread = None
+
+    def prefetch(self, key_list: List[Any]):
+        """set frames to be read in background (previous ones are discarded)
+
+        Args:
+            key_list (List[Any]): keys of frames in order of priority
+        """
+        with self.condition:
+            self.prefetch_list = [key for key in key_list if key not in self.frames]
+            self.prefetch_list.reverse()
+            self.prefetch_count = 0
+            self.condition.notify_all()
+
+    def get(self, key: Any) -> numpy.array:
+        """get frame (frame is read by loader if it is not cached)
+
+        Args:
+            key (Any): frame number of movie or picture path
+
+        Returns:
+            numpy.array: cv2 image object
+        """
+        with self.condition:
+            if key in self.frames:
+                self.frames.move_to_end(key)
+                return self.frames[key]
+
+            if self.thread is None:
+                frame = self.loader(key)
+                self.add(key, frame)
+                return frame
+
+            self.failed.discard(key)
+            self.errors.pop(key, None)
+            self.requested.append(key)
+            self.condition.notify_all()
+            while not (key in self.frames or key in self.failed or key in self.errors):
+                self.condition.wait()
+            if key in self.errors:
+                raise self.errors.pop(key)
+            return self.frames.get(key)
+
+    def add(self, key: Any, frame: Optional[numpy.array]):
+        """add frame into cache (this must be called holding condition)
+
+        Args:
+            key (Any): frame number of movie or picture path
+            frame (Optional[numpy.array]): cv2 image object
+        """
+        if frame is None:
+            self.failed.add(key)
+            return
+
+        self.frames[key] = frame
+        self.total_bytes += frame.nbytes
+        self.frame_bytes = frame.nbytes
+        while self.max_bytes < self.total_bytes and 1 < len(self.frames):
+            key_old, frame_old = self.frames.popitem(last=False)
+            self.total_bytes -= frame_old.nbytes
+
+    def run(self):
+        """read requested frames and prefetched frames (called in thread)"""
+        while True:
+            with self.condition:
+                while not self.stopped:
+                    if self.requested:
+                        key = self.requested.pop(0)
+                        break
+                    # prefetched frames are limited to half of cache not to
+                    # discard frames prefetched just before
+                    limit = self.max_bytes // max(self.frame_bytes, 1) // 2
+                    if self.prefetch_list and (self.prefetch_count < limit):
+                        key = self.prefetch_list.pop()
+                        self.prefetch_count += 1
+                        break
+                    self.condition.wait()
+                if self.stopped:
+                    return
+                if key in self.frames:
+                    continue
+
+            # exception is kept for get() not to wait for frame forever
+            try:
+                frame = self.loader(key)
+            except Exception as e:
+                with self.condition:
+                    self.errors[key] = e
+                    self.condition.notify_all()
+                continue
+
+            with self.condition:
+                self.add(key, frame)
+                self.condition.notify_all()
+
+
+def get_prefetch_list(frame_now: int, frames: int, tick: int, tick_s: int) -> List[int]:
+    """get frame numbers to be prefetched in GUI window with trackbars
+
+    Args:
+        frame_now (int): frame number shown now
+        frames (int): last frame number
+        tick (int): number of ticks of 'frame' trackbar
+        tick_s (int): frames per tick of 'frame' trackbar ('frame s' trackbar range)
+
+    Returns:
+        List[int]: frame numbers in order of priority
+    """
+    neighbor_list = [frame_now + diff for diff in [1, -1, 2, -2, 3, -3, 4, -4]]
+    grid_list = sorted(
+        [idx * tick_s for idx in range(tick)], key=lambda f: abs(f - frame_now)
+    )
+    return [f for f in neighbor_list + grid_list if 0 <= f <= frames]
+
+
+def read_movie_frame(
+    cap: cv2.VideoCapture, frame: int, scale: float = 1.0
+) -> Optional[numpy.array]:
+    """read one frame of movie
+
+    Args:
+        cap (cv2.VideoCapture): cv2 video object
+        frame (int): frame number
+        scale (float): scale of image to be returned
+
+    Returns:
+        Optional[numpy.array]: cv2 image object (None if frame cannot be read)
+    """
+    cap.set(cv2.CAP_PROP_POS_FRAMES, frame)
+    ret, img = cap.read()
+    return resize_proxy(img, scale) if ret else None
+
+
+def read_binarized_picture(picture: str, scale: float = 1.0) -> Optional[numpy.array]:
+    """read binarized picture (picture is kept binarized even if it is scaled)
+
+    Args:
+        picture (str): picture path
+        scale (float): scale of image to be returned
+
+    Returns:
+        Optional[numpy.array]: cv2 image object (None if picture cannot be read)
+    """
+    img = cv2.imread(picture, cv2.IMREAD_GRAYSCALE)
+    return resize_proxy(img, scale, cv2.INTER_NEAREST) if img is not None else None
+
+
+def get_movie_info(
+    cap: cv2.VideoCapture, movie: Optional[str] = None
+) -> Tuple[int, int, int, float]:
     """get movie information
 
+    if movie file name is given, information is cached in
+    'cv2/movie-noExtension/movie_info.json' and reused while path, size, and
+    modification time of movie are not changed.
+
     Args:
         cap (cv2.VideoCapture): cv2 video object
+        movie (Optional[str]): movie file name used as key of cache
 
     Returns:
         Tuple[int, int, int, float]: W, H, total frame, fps of movie
     """
+    if movie is not None:
+        info = load_movie_info(movie)
+        if info is not None:
+            return info
+
     W = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
     H = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
     fps = cap.get(cv2.CAP_PROP_FPS)
@@ -107,16 +431,300 @@ def get_movie_info(cap: cv2.VideoCapture) -> Tuple[int, int, int, float]:
     cap.set(cv2.CAP_PROP_POS_FRAMES, temp_frames)
 
     # CAP_PROP_FRAME_COUNT is usually not correct.
-    # so take temporal frame number first, then find the correct number
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
+    # so take temporal frame number first, then find the correct number.
+    for _ in grab_frames(cap):
+        pass
     frames = int(cap.get(cv2.CAP_PROP_POS_FRAMES)) - 1
     cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+
+    if movie is not None:
+        save_movie_info(movie, (W, H, frames, fps))
     return (W, H, frames, fps)
 
 
+def grab_frames(cap: cv2.VideoCapture) -> Iterator[Tuple[float, int]]:
+    """grab frames of movie one by one from current position
+
+    grab() only reads frames without retrieving (converting) them. grabbed frame
+    can be retrieved using cap.retrieve() until the next frame is grabbed.
+
+    Args:
+        cap (cv2.VideoCapture): cv2 video object
+
+    Yields:
+        Iterator[Tuple[float, int]]: time (s) and index of grabbed frame
+    """
+    while cap.grab():
+        time = cap.get(cv2.CAP_PROP_POS_MSEC) * 0.001
+        yield (time, int(cap.get(cv2.CAP_PROP_POS_FRAMES)) - 1)
+
+
+def seek_frames(
+    cap: cv2.VideoCapture, start: Optional[float] = None, margin: float = 1.0
+) -> Iterator[Tuple[float, int]]:
+    """grab frames of movie from a little before start time (see grab_frames)
+
+    movie is seeked to `margin` seconds before start, so frames before it are
+    never decoded. since seeking of some codecs is not exact, movie is read from
+    the first frame if the first grabbed frame is after start. frames before
+    start are still given, so select frames exactly using sample_frames.
+
+    Args:
+        cap (cv2.VideoCapture): cv2 video object
+        start (Optional[float]): start time (s) (from the first frame if None)
+        margin (float): time (s) seeked before start
+
+    Yields:
+        Iterator[Tuple[float, int]]: time (s) and index of grabbed frame
+    """
+    if (start is not None) and (margin < start):
+        cap.set(cv2.CAP_PROP_POS_MSEC, (start - margin) * 1000)
+        grabbed = grab_frames(cap)
+        first = next(grabbed, None)
+        if (first is not None) and (first[0] <= start):
+            yield first
+            yield from grabbed
+            return
+        cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+
+    yield from grab_frames(cap)
+
+
+def sample_frames(
+    frames: Iterable[Tuple[float, Any]],
+    stride: int = 1,
+    start: Optional[float] = None,
+    end: Optional[float] = None,
+) -> Iterator[Tuple[float, Any]]:
+    """select every stride-th frame in time window from start to end
+
+    frames must be given in time order, and iteration stops at the first frame
+    after end, so frames out of the selection are never read.
+
+    Args:
+        frames (Iterable[Tuple[float, Any]]): time (s) and frame (or its key)
+        stride (int): interval of selected frames
+        start (Optional[float]): start time (s) (from the first frame if None)
+        end (Optional[float]): end time (s) (to the last frame if None)
+
+    Yields:
+        Iterator[Tuple[float, Any]]: time (s) and frame (or its key) selected
+    """
+    stride = max(stride, 1)
+    count = 0
+
+    for frame in frames:
+        if (start is not None) and (frame[0] < start):
+            continue
+        if (end is not None) and (end < frame[0]):
+            break
+        if count % stride == 0:
+            yield frame
+        count += 1
+
+
+def get_movie_key(movie: str) -> Dict[str, Union[str, int]]:
+    """get key identifying movie file (path, size, and modification time)
+
+    Args:
+        movie (str): movie file name
+
+    Returns:
+        Dict[str, Union[str, int]]: key of movie
+    """
+    movie_path = pathlib.Path(movie).resolve()
+    stat = movie_path.stat()
+    return {"path": str(movie_path), "size": stat.st_size, "mtime": stat.st_mtime_ns}
+
+
+def load_movie_info(movie: str) -> Optional[Tuple[int, int, int, float]]:
+    """load cached movie information
+
+    Args:
+        movie (str): movie file name
+
+    Returns:
+        Optional[Tuple[int, int, int, float]]: W, H, total frame, fps of movie
+    """
+    cv2_path = pathlib.Path(pathlib.Path.cwd() / "cv2")
+    info_path = pathlib.Path(cv2_path / pathlib.Path(movie).stem / "movie_info.json")
+    if not info_path.is_file():
+        return None
+
+    try:
+        info = json.loads(info_path.read_text())
+        if info["key"] != get_movie_key(movie):
+            return None
+        return (info["W"], info["H"], info["frames"], info["fps"])
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+def save_movie_info(movie: str, info: Tuple[int, int, int, float]):
+    """save movie information as cache
+
+    Args:
+        movie (str): movie file name
+        info (Tuple[int, int, int, float]): W, H, total frame, fps of movie
+    """
+    cv2_path = pathlib.Path(pathlib.Path.cwd() / "cv2")
+    info_path = pathlib.Path(cv2_path / pathlib.Path(movie).stem / "movie_info.json")
+    info_path.parent.mkdir(parents=True, exist_ok=True)
+    W, H, frames, fps = info
+    data = {"key": get_movie_key(movie), "W": W, "H": H, "frames": frames, "fps": fps}
+    info_path.write_text(json.dumps(data, indent=2))
+
+
+def get_filled_row(image: numpy.array, threshold: int) -> Optional[int]:
+    """get the first row where white area reaches threshold
+
+    Args:
+        image (numpy.array): binarized cv2 image object (area to be checked)
+        threshold (int): threshold % for determining if particles are filled or not
+
+    Returns:
+        Optional[int]: index of the first filled row (None if no row is filled)
+    """
+    row = int(get_filled_rows(image[numpy.newaxis], threshold, -1)[0])
+    return row if row != -1 else None
+
+
+def get_filled_rows(images: numpy.array, threshold: int, default: int) -> numpy.array:
+    """get the first row where white area reaches threshold for stacked images
+
+    white area % of every row of every image is calculated at once (one reduction
+    per batch), and the first row satisfying threshold is picked up using argmax.
+
+    Args:
+        images (numpy.array): binarized cv2 image objects stacked as (N, H, W) array
+        threshold (int): threshold % for determining if particles are filled or not
+        default (int): value given to image where no row is filled
+
+    Returns:
+        numpy.array: index of the first filled row of each image (N,)
+    """
+    if (images.shape[1] == 0) or (images.shape[2] == 0):
+        return numpy.full(images.shape[0], default, dtype=numpy.int64)
+
+    white_area = numpy.count_nonzero(images, axis=2) / images.shape[2] * 100.0
+    filled = threshold <= white_area
+    rows = numpy.argmax(filled, axis=1)
+    return numpy.where(filled[numpy.arange(len(rows)), rows], rows, default)
+
+
+def get_filled_edges(
+    images: numpy.array, threshold: int, default: int, window: int
+) -> numpy.array:
+    """get sub-pixel edge where white area crosses threshold for stacked images
+
+    white area % of rows is smoothed by moving average of `window` rows (isolated
+    speckle row is ignored), and the crossing between the first filled row and
+    the row above is linearly interpolated. edge is given in the same scale as
+    get_filled_rows (a sharp fill starting at row r gives r). moving average is
+    truncated within window // 2 rows from top and bottom of images.
+
+    Args:
+        images (numpy.array): binarized cv2 image objects stacked as (N, H, W) array
+        threshold (int): threshold % for determining if particles are filled or not
+        default (int): value given to image where no row is filled
+        window (int): number of rows of moving average (odd, 1 is not smoothed)
+
+    Returns:
+        numpy.array: sub-pixel edge of each image (N,)
+    """
+    N, H, W = images.shape
+    if (H == 0) or (W == 0):
+        return numpy.full(N, default, dtype=numpy.float64)
+
+    white_area = numpy.count_nonzero(images, axis=2) / W * 100.0
+
+    # moving average (rows out of image are not counted)
+    half = max(window, 1) // 2
+    cumsum = numpy.zeros((N, H + 1))
+    numpy.cumsum(white_area, axis=1, out=cumsum[:, 1:])
+    index = numpy.arange(H)
+    lower = numpy.clip(index - half, 0, H)
+    upper = numpy.clip(index + half + 1, 0, H)
+    profile = (cumsum[:, upper] - cumsum[:, lower]) / (upper - lower)
+
+    filled = threshold <= profile
+    rows = numpy.argmax(filled, axis=1)
+    found = filled[numpy.arange(N), rows]
+
+    # crossing between row-1 and row (pixel centers), shifted by 0.5 to edge
+    above = profile[numpy.arange(N), numpy.maximum(rows - 1, 0)]
+    below = profile[numpy.arange(N), rows]
+    step = numpy.where(below - above > 0, below - above, 1.0)
+    ratio = numpy.clip((threshold - above) / step, 0.0, 1.0)
+    edges = numpy.where(rows == 0, 0.0, rows - 0.5 + ratio)
+
+    return numpy.where(found, edges, float(default))
+
+
+def detect_filled_rows(
+    images: numpy.array,
+    threshold: int,
+    default: int,
+    subpixel: int = 0,
+    track: int = 0,
+    block: int = 16,
+) -> numpy.array:
+    """get filled row (or sub-pixel edge) of stacked images using selected detector
+
+    if track is given, images are searched block by block (`block` images) only in
+    band of +-track rows around front of the last image of the previous block (front
+    of the first image is searched in whole image), so band follows front moving
+    within stacked images. images whose front is not found in band (or found on edge
+    of band) are searched in whole image again, so result is the same unless
+    particles are isolated above the band.
+
+    Args:
+        images (numpy.array): binarized cv2 image objects stacked as (N, H, W) array
+        threshold (int): threshold % for determining if particles are filled or not
+        default (int): value given to image where no row is filled
+        subpixel (int): number of rows smoothed in sub-pixel detection
+            (see get_filled_edges, disabled if 0)
+        track (int): half width (rows) of band searched (disabled if 0)
+        block (int): number of images searched in the same band
+
+    Returns:
+        numpy.array: filled row (or sub-pixel edge) of each image (N,)
+    """
+    if subpixel:
+        detect = functools.partial(get_filled_edges, window=subpixel)
+    else:
+        detect = get_filled_rows
+
+    N, H = images.shape[:2]
+    if (track <= 0) or (N <= 1) or (H == 0):
+        return detect(images, threshold, default)
+
+    # rows near edge of band are affected by cut (smoothing window, rows above)
+    margin = subpixel // 2 + 1 if subpixel else 0
+    center = int(round(float(detect(images[:1], threshold, H)[0])))
+    rows_list: List[numpy.array] = []
+
+    for begin in range(0, N, max(block, 1)):
+        part = images[begin : begin + max(block, 1)]
+        lower = max(center - track, 0)
+        upper = min(center + track + 1, H)
+
+        rows = detect(part[:, lower:upper], threshold, -1) + lower
+        retry = rows < lower
+        if 0 < lower:
+            retry |= rows <= lower + margin
+        if upper < H:
+            retry |= upper - 1 - margin <= rows
+        if retry.any():
+            rows[retry] = detect(part[retry], threshold, default)
+
+        rows_list.append(rows)
+        # image where no row is filled is regarded as filled from bottom (H)
+        center = H if rows[-1] == default else int(round(float(rows[-1])))
+
+    return numpy.concatenate(rows_list)
+
+
 def get_input_list(target_list: List[str], input_type: str) -> List[str]:
     """get output path list
 
@@ -157,16 +765,116 @@ def get_input_list(target_list: List[str], input_type: str) -> List[str]:
     return path_list
 
 
-def measure(target_list: List[str], movie_list: List[str]):
+def get_picture_list(directory: str) -> List[Tuple[float, str]]:
+    """get pictures in directory sorted by time
+
+    time is given by the last 8-10 digits number (ms) in picture name.
+    pictures without the number are ignored. see load_picture_index.
+
+    Args:
+        directory (str): directory where pictures are stored
+
+    Returns:
+        List[Tuple[float, str]]: list of time (s) and picture path
+    """
+    time_ms, name_list = load_picture_index(directory)
+    directory_path = pathlib.Path(directory)
+    return list(
+        zip(
+            (time_ms * 0.001).tolist(),
+            [str(directory_path / name) for name in name_list.tolist()],
+        )
+    )
+
+
+def load_picture_index(directory: str) -> Tuple[numpy.array, numpy.array]:
+    """load index of pictures (time and name sorted by time) in directory
+
+    index is stored in 'directory_index.npz' with modified time of directory, and
+    it is rebuilt only if pictures are added or removed (modified time is changed),
+    so that directory is not scanned and parsed every time.
+
+    Args:
+        directory (str): directory where pictures are stored
+
+    Returns:
+        Tuple[numpy.array, numpy.array]: time (ms, int64) and picture name
+    """
+    directory_path = pathlib.Path(directory)
+    index_path = directory_path.with_name(directory_path.name + "_index.npz")
+    mtime = directory_path.stat().st_mtime_ns
+
+    if index_path.is_file():
+        try:
+            with numpy.load(index_path) as data:
+                if int(data["mtime"]) == mtime:
+                    return (data["time_ms"], data["name"])
+        except (ValueError, KeyError, OSError):
+            pass
+
+    regex = re.compile("\\d{8,10}")
+    time_list: List[int] = []
+    name_list: List[str] = []
+
+    for p in directory_path.iterdir():
+        match = regex.findall(p.name)
+        if match:
+            time_list.append(int(match[-1]))
+            name_list.append(p.name)
+
+    time_ms = numpy.array(time_list, dtype=numpy.int64)
+    name = numpy.array(name_list, dtype=str)
+    order = numpy.lexsort((name, time_ms))
+    time_ms, name = time_ms[order], name[order]
+
+    try:
+        with open(index_path, "wb") as f:
+            numpy.savez(f, mtime=numpy.int64(mtime), time_ms=time_ms, name=name)
+    except OSError:
+        pass
+
+    return (time_ms, name)
+
+
+def measure(
+    target_list: List[str],
+    movie_list: List[str],
+    batch_size: int = 256,
+    jobs: int = 1,
+    calibration_mode: str = "force",
+    output_format: str = "csv",
+    subpixel: int = 0,
+    track: int = 0,
+    stride: int = 1,
+    start: Optional[float] = None,
+    end: Optional[float] = None,
+):
     """measure climbing height (this require binarized data and movie)
 
+    calibration used is stored as '_height.csv.json' next to output. if output
+    measured with the same calibration exists, only frames not in output are
+    measured and added, so that interrupted or appended capture is resumed.
+
     Args:
         target_list (List[str]): list of binarized data of movie
         movie_list (List[str]): list of movie
+        batch_size (int): number of pictures loaded and measured at once
+        jobs (int): number of processes measuring pictures in parallel
+        calibration_mode (str): 'reuse' (use stored calibration if exists),
+            'force' (always select calibration using GUI window) or
+            'stored' (use only stored calibration without GUI window)
+        output_format (str): 'csv' (_height.csv) or 'npy' (_height.npy)
+        subpixel (int): number of rows smoothed in sub-pixel detection
+            (see get_filled_edges, disabled if 0)
+        track (int): half width of band searched around front of the previous
+            pictures (see detect_filled_rows, disabled if 0)
+        stride (int): interval of measured pictures (see sample_frames)
+        start (Optional[float]): start time (s) of measured pictures
+        end (Optional[float]): end time (s) of measured pictures
     """
-    regex = re.compile("\d{8,10}")
     target_tuple_list: List[Tuple[str, str, str]] = []
     cv2_path = pathlib.Path(pathlib.Path.cwd() / "cv2")
+    batch_size = max(batch_size, 1)
 
     for movie in movie_list:
         movie_path = pathlib.Path(movie)
@@ -180,53 +888,435 @@ def measure(target_list: List[str], movie_list: List[str]):
         print("no movie to be read exists, or no binarized data exists!")
         return None
 
-    for target_tuple in target_tuple_list:
+    executor = ProcessPoolExecutor(max_workers=jobs) if 1 < jobs else None
 
-        cap = cv2.VideoCapture(target_tuple[1])
-        W, H, frames, fps = get_movie_info(cap)
-        mm_per_pixel = select_reference_length(target_tuple[1], frames, cap)
-        if mm_per_pixel is None:
-            continue
+    for target_tuple in target_tuple_list:
 
-        binarized_path = pathlib.Path(target_tuple[0])
-        p_list = [str(p) for p in list(binarized_path.iterdir())]
+        # pictures sorted by time are given to GUI window and measurement
+        frame_list = get_picture_list(target_tuple[0])
+        p_list = [picture for time, picture in frame_list]
         if not p_list:
             print("no file exists in '{0}'!".format(target_tuple[0]))
             continue
 
-        places = select_reference_place(target_tuple[0], p_list)
-        if not places:
+        offset = load_picture_offset(target_tuple[0], p_list[0])
+        calibration = calibrate(
+            target_tuple[1], target_tuple[0], p_list, calibration_mode, offset=offset
+        )
+        if calibration is None:
             continue
 
-        bottom, tube_pos, threshold = places
         pathlib.Path(target_tuple[2]).resolve().mkdir(parents=True, exist_ok=True)
-        output = (
-            target_tuple[2] + "/" + pathlib.Path(target_tuple[1]).stem + "_height.csv"
+        output = "{0}/{1}_height.{2}".format(
+            target_tuple[2], pathlib.Path(target_tuple[1]).stem, output_format
         )
 
-        with open(output, "w", newline="") as f:
+        calibration = shift_calibration(calibration, offset)
+        img = cv2.imread(p_list[0], cv2.IMREAD_GRAYSCALE)
+        if (img is None) or (
+            not check_tube_area(calibration, img.shape, target_tuple[0])
+        ):
+            continue
+
+        frame_list = list(sample_frames(frame_list, stride, start, end))
+        if not frame_list:
+            print("no picture is selected in '{0}'!".format(target_tuple[0]))
+            continue
 
-            w = csv.writer(f)
-            w.writerow(["time_s", "height_mm"])
+        # frames measured with the same calibration are skipped (resume)
+        measured_time = None
+        setting = dict(calibration, subpixel=subpixel, track=track)
+        if load_height_calibration(output) == setting:
+            measured_time = height.get_measured_time(output)
+        if measured_time is None:
+            save_height_calibration(output, calibration, subpixel, track)
+        else:
+            # time is compared in ms, since time written from movie (stream) is
+            # not rounded to ms as time given by picture name
+            measured_set = set(height.get_time_ms(measured_time).tolist())
+            time_ms = height.get_time_ms([f[0] for f in frame_list]).tolist()
+            frame_list = [
+                f for f, t in zip(frame_list, time_ms) if t not in measured_set
+            ]
+            if not frame_list:
+                print("all frames are already measured in '{0}'".format(output))
+                continue
+            print("{0} frames are added to '{1}'".format(len(frame_list), output))
+
+        chunk_list = [
+            frame_list[start : start + batch_size]
+            for start in range(0, len(frame_list), batch_size)
+        ]
+        measure_chunk = functools.partial(
+            measure_pictures, subpixel=subpixel, track=track, **calibration
+        )
 
-            for p in p_list:
+        # executor.map returns results in order of chunk (timestamp order)
+        if executor is None:
+            result_list = map(measure_chunk, chunk_list)
+        else:
+            result_list = executor.map(measure_chunk, chunk_list)
 
-                match = regex.findall(p)
-                if not match:
-                    continue
+        height.save_height(output, result_list, measured_time is not None)
+        if (measured_time is not None) and len(measured_time):
+            if frame_list[0][0] < measured_time.max():
+                height.sort_height(output)
 
-                img = cv2.imread(p, cv2.IMREAD_GRAYSCALE)
-                cut = img[:bottom, tube_pos[0] : tube_pos[1]]
-                height = bottom
+    if executor is not None:
+        executor.shutdown()
 
-                for idx, y in enumerate(cut):
-                    white_size = numpy.count_nonzero(y)
-                    white_area = white_size / len(y) * 100.0
-                    if threshold <= white_area:
-                        height = idx
-                        break
 
-                w.writerow([float(match[-1]) * 0.001, (bottom - height) * mm_per_pixel])
+def calibrate(
+    movie: str,
+    directory: str,
+    picture_list: List[Any],
+    mode: str = "force",
+    reader: Callable[..., Optional[numpy.array]] = read_binarized_picture,
+    offset: Tuple[int, int] = (0, 0),
+) -> Optional[Dict[str, Any]]:
+    """get calibration (mm/pixel, reference lines and threshold) for measurement
+
+    calibration is selected using GUI window and stored in
+    'cv2/movie-noExtension/calibration.json'. if mode is 'reuse' and stored
+    calibration exists, it is given without GUI window. if mode is 'stored'
+    (headless), GUI window is never opened and None is given without stored one.
+
+    Args:
+        movie (str): movie file name
+        directory (str): directory name of binarized pictures
+        picture_list (List[Any]): picture list (or keys of binarized frames)
+        mode (str): 'reuse', 'force' or 'stored'
+        reader (Callable[..., Optional[numpy.array]]): function reading binarized
+            frame from item of picture_list (see select_reference_place)
+        offset (Tuple[int, int]): offset (x, y) of pictures in movie frame
+            (see load_picture_offset)
+
+    Returns:
+        Optional[Dict[str, Any]]: mm_per_pixel, bottom, tube_pos, threshold
+    """
+    if mode in ["reuse", "stored"]:
+        calibration = load_calibration(movie)
+        if calibration is not None:
+            print("stored calibration is used for '{0}' {1}".format(movie, calibration))
+            return calibration
+
+    if mode == "stored":
+        print("no stored calibration exists for '{0}'!".format(movie))
+        return None
+
+    cap = cv2.VideoCapture(movie)
+    W, H, frames, fps = get_movie_info(cap, movie)
+    mm_per_pixel = select_reference_length(movie, frames, cap)
+    if mm_per_pixel is None:
+        return None
+
+    places = select_reference_place(directory, picture_list, reader)
+    if not places:
+        return None
+
+    # pictures may be written only in tube area, so position is shifted by offset
+    bottom = places[0] + offset[1]
+    tube_pos = (places[1][0] + offset[0], places[1][1] + offset[0])
+    threshold = places[2]
+    calibration = {
+        "mm_per_pixel": mm_per_pixel,
+        "bottom": bottom,
+        "tube_pos": tube_pos,
+        "threshold": threshold,
+    }
+    save_calibration(movie, calibration)
+    return calibration
+
+
+def load_calibration(movie: str) -> Optional[Dict[str, Any]]:
+    """load stored calibration of movie
+
+    Args:
+        movie (str): movie file name
+
+    Returns:
+        Optional[Dict[str, Any]]: mm_per_pixel, bottom, tube_pos, threshold
+    """
+    cv2_path = pathlib.Path(pathlib.Path.cwd() / "cv2")
+    calibration_path = pathlib.Path(
+        cv2_path / pathlib.Path(movie).stem / "calibration.json"
+    )
+    if not calibration_path.is_file():
+        return None
+
+    try:
+        return parse_calibration(json.loads(calibration_path.read_text()))
+    except (ValueError, KeyError, TypeError, IndexError):
+        print("'{0}' is broken!".format(str(calibration_path)))
+        return None
+
+
+def parse_calibration(data: Dict[str, Any]) -> Dict[str, Any]:
+    """convert calibration loaded from .json file into calibration
+
+    Args:
+        data (Dict[str, Any]): loaded calibration (tube_pos is given as list)
+
+    Returns:
+        Dict[str, Any]: mm_per_pixel, bottom, tube_pos, threshold
+    """
+    return {
+        "mm_per_pixel": float(data["mm_per_pixel"]),
+        "bottom": int(data["bottom"]),
+        "tube_pos": (int(data["tube_pos"][0]), int(data["tube_pos"][1])),
+        "threshold": int(data["threshold"]),
+    }
+
+
+def save_calibration(movie: str, calibration: Dict[str, Any]):
+    """store calibration of movie
+
+    Args:
+        movie (str): movie file name
+        calibration (Dict[str, Any]): mm_per_pixel, bottom, tube_pos, threshold
+    """
+    cv2_path = pathlib.Path(pathlib.Path.cwd() / "cv2")
+    calibration_path = pathlib.Path(
+        cv2_path / pathlib.Path(movie).stem / "calibration.json"
+    )
+    calibration_path.parent.mkdir(parents=True, exist_ok=True)
+    calibration_path.write_text(json.dumps(calibration, indent=2))
+
+
+def load_height_calibration(output: str) -> Optional[Dict[str, Any]]:
+    """load calibration (and detection setting) used for measured height
+
+    Args:
+        output (str): output file (_height.csv or _height.npy)
+
+    Returns:
+        Optional[Dict[str, Any]]: mm_per_pixel, bottom, tube_pos, threshold,
+            subpixel, track
+    """
+    output_path = pathlib.Path(output)
+    calibration_path = output_path.with_name(output_path.name + ".json")
+    if not calibration_path.is_file():
+        return None
+
+    try:
+        data = json.loads(calibration_path.read_text())
+        calibration = parse_calibration(data)
+        calibration["subpixel"] = int(data.get("subpixel", 0))
+        calibration["track"] = int(data.get("track", 0))
+        return calibration
+    except (ValueError, KeyError, TypeError, IndexError, AttributeError):
+        return None
+
+
+def save_height_calibration(
+    output: str, calibration: Dict[str, Any], subpixel: int = 0, track: int = 0
+):
+    """store calibration used for measured height (e.g. '_height.csv.json')
+
+    Args:
+        output (str): output file (_height.csv or _height.npy)
+        calibration (Dict[str, Any]): mm_per_pixel, bottom, tube_pos, threshold
+        subpixel (int): number of rows smoothed in sub-pixel detection
+        track (int): half width of band searched in tracking
+    """
+    output_path = pathlib.Path(output)
+    calibration_path = output_path.with_name(output_path.name + ".json")
+    data = dict(calibration, subpixel=subpixel, track=track)
+    calibration_path.write_text(json.dumps(data, indent=2))
+
+
+def read_tube_area(
+    picture: str, bottom: int, tube_pos: Tuple[int, int]
+) -> Optional[numpy.array]:
+    """read binarized picture keeping only tube area in memory
+
+    cv2 decoder (png, jpg, etc.) cannot skip rows, so picture is decoded as a whole,
+    then tube area is copied so that the whole picture is released at once.
+
+    Args:
+        picture (str): picture path
+        bottom (int): bottom line for measurement
+        tube_pos (Tuple[int, int]): tube position lines
+
+    Returns:
+        Optional[numpy.array]: tube area (None if picture cannot be read)
+    """
+    img = cv2.imread(picture, cv2.IMREAD_GRAYSCALE)
+    if img is None:
+        return None
+    return numpy.ascontiguousarray(img[:bottom, tube_pos[0] : tube_pos[1]])
+
+
+def shift_calibration(
+    calibration: Dict[str, Any], offset: Tuple[int, int]
+) -> Dict[str, Any]:
+    """shift calibration (reference lines) for pictures written with offset
+
+    Args:
+        calibration (Dict[str, Any]): mm_per_pixel, bottom, tube_pos, threshold
+        offset (Tuple[int, int]): offset (x, y) of pictures in movie frame
+
+    Returns:
+        Dict[str, Any]: calibration for pictures
+    """
+    tube_pos = calibration["tube_pos"]
+    return dict(
+        calibration,
+        bottom=calibration["bottom"] - offset[1],
+        tube_pos=(tube_pos[0] - offset[0], tube_pos[1] - offset[0]),
+    )
+
+
+def check_tube_area(
+    calibration: Dict[str, Any], shape: Tuple[int, ...], name: str
+) -> bool:
+    """check if tube area of calibration is inside of frame (or picture)
+
+    stored calibration or calibration given in manifest may be selected for frames
+    of another size, so it is checked before measurement.
+
+    Args:
+        calibration (Dict[str, Any]): mm_per_pixel, bottom, tube_pos, threshold
+        shape (Tuple[int, ...]): shape (H, W, ...) of frame
+        name (str): movie or directory name shown in message
+
+    Returns:
+        bool: whether tube area is inside of frame
+    """
+    bottom, tube_pos = calibration["bottom"], calibration["tube_pos"]
+    if (0 < bottom <= shape[0]) and (0 <= tube_pos[0] < tube_pos[1] <= shape[1]):
+        return True
+
+    print(
+        "bottom {0} and tube position {1} are out of frame ({2}x{3}) of '{4}'!".format(
+            bottom, tuple(tube_pos), shape[1], shape[0], name
+        )
+    )
+    print("select calibration again (e.g. '--calibration force')")
+    return False
+
+
+def load_picture_offset(directory: str, picture: str) -> Tuple[int, int]:
+    """load offset of pictures written only in tube area
+
+    offset is stored in 'directory_offset.json' with size of pictures, and it is
+    used only if size of given picture is the same (otherwise pictures are
+    regarded as rewritten as a whole).
+
+    Args:
+        directory (str): directory where pictures are stored
+        picture (str): one of pictures in directory
+
+    Returns:
+        Tuple[int, int]: offset (x, y) of pictures in movie frame
+    """
+    directory_path = pathlib.Path(directory)
+    offset_path = directory_path.with_name(directory_path.name + "_offset.json")
+    if not offset_path.is_file():
+        return (0, 0)
+
+    try:
+        data = json.loads(offset_path.read_text())
+        img = cv2.imread(picture, cv2.IMREAD_GRAYSCALE)
+        if (img is None) or (list(img.shape) != data["shape"]):
+            return (0, 0)
+        return (int(data["offset"][0]), int(data["offset"][1]))
+    except (ValueError, KeyError, TypeError, IndexError):
+        return (0, 0)
+
+
+def save_picture_offset(
+    directory: str, offset: Optional[Tuple[int, int]], shape: Tuple[int, int] = (0, 0)
+):
+    """store offset of pictures written only in tube area
+
+    Args:
+        directory (str): directory where pictures are stored
+        offset (Optional[Tuple[int, int]]): offset (x, y) of pictures in movie frame
+            (stored offset is removed if None)
+        shape (Tuple[int, int]): size (H, W) of pictures
+    """
+    directory_path = pathlib.Path(directory)
+    offset_path = directory_path.with_name(directory_path.name + "_offset.json")
+    if offset is None:
+        if offset_path.is_file():
+            offset_path.unlink()
+        return
+
+    data = {"offset": list(offset), "shape": list(shape)}
+    offset_path.write_text(json.dumps(data, indent=2))
+
+
+def measure_frames(
+    frame_list: List[Tuple[float, numpy.array]],
+    mm_per_pixel: float,
+    bottom: int,
+    tube_pos: Tuple[int, int],
+    threshold: int,
+    subpixel: int = 0,
+    track: int = 0,
+) -> Tuple[List[float], List[float]]:
+    """measure climbing height of binarized frames (in memory) at once
+
+    Args:
+        frame_list (List[Tuple[float, numpy.array]]): list of time (s) and frame
+        mm_per_pixel (float): mm per pixel
+        bottom (int): bottom line for measurement
+        tube_pos (Tuple[int, int]): tube position lines
+        threshold (int): threshold % for determining if particles are filled or not
+        subpixel (int): number of rows smoothed in sub-pixel detection
+            (see get_filled_edges, disabled if 0)
+        track (int): half width of band searched around front of the previous
+            frames (see detect_filled_rows, disabled if 0)
+
+    Returns:
+        Tuple[List[float], List[float]]: time (s) and height (mm) of frames
+    """
+    batch = numpy.stack(
+        [frame[:bottom, tube_pos[0] : tube_pos[1]] for time, frame in frame_list]
+    )
+    heights = detect_filled_rows(batch, threshold, bottom, subpixel, track)
+    time_list = [time for time, frame in frame_list]
+    return (time_list, ((bottom - heights) * mm_per_pixel).tolist())
+
+
+def measure_pictures(
+    frame_list: List[Tuple[float, str]],
+    mm_per_pixel: float,
+    bottom: int,
+    tube_pos: Tuple[int, int],
+    threshold: int,
+    subpixel: int = 0,
+    track: int = 0,
+) -> Tuple[List[float], List[float]]:
+    """measure climbing height of binarized pictures at once
+
+    pictures are cropped and stacked into one array, then measured by one reduction.
+    this is also called in worker process when measurement is executed in parallel.
+
+    Args:
+        frame_list (List[Tuple[float, str]]): list of time (s) and binarized picture
+        mm_per_pixel (float): mm per pixel
+        bottom (int): bottom line for measurement
+        tube_pos (Tuple[int, int]): tube position lines
+        threshold (int): threshold % for determining if particles are filled or not
+        subpixel (int): number of rows smoothed in sub-pixel detection
+            (see get_filled_edges, disabled if 0)
+        track (int): half width of band searched around front of the previous
+            frames (see detect_filled_rows, disabled if 0)
+
+    Returns:
+        Tuple[List[float], List[float]]: time (s) and height (mm) of pictures
+    """
+    batch = numpy.empty(
+        (len(frame_list), bottom, tube_pos[1] - tube_pos[0]), dtype=numpy.uint8
+    )
+    for idx, (time, p) in enumerate(frame_list):
+        batch[idx] = read_tube_area(p, bottom, tube_pos)
+
+    heights = detect_filled_rows(batch, threshold, bottom, subpixel, track)
+    time_list = [time for time, p in frame_list]
+    return (time_list, ((bottom - heights) * mm_per_pixel).tolist())
 
 
 # def measure(target_list: List[str], movie_list: List[str]):
@@ -332,15 +1422,33 @@ def select_reference_length(
     points: List[Tuple[int, int]] = []
     warning_message: List[str] = []
     cv2.namedWindow(movie, cv2.WINDOW_NORMAL)
-    cv2.setMouseCallback(movie, mouse_on_select_positions, points)
+    W = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    H = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    full = False
+    scale = get_window_scale(movie, W, H, full)
+    loader = functools.partial(read_movie_frame, cap)
     line_color = (255, 255, 255)
+    frame_cache = start_frame_cache(movie, points, loader, scale)
+    drawn_state: Optional[Tuple] = None
 
     print("--- measure ---")
     print("select line mm/pixel in GUI window!")
-    print("(s: save if selected, h:on/off help, c: clear, click: select, q/esc: abort)")
+    print(
+        "(s: save if selected, h:on/off help, c: clear, click: select, "
+        "f: on/off full resolution, q/esc: abort)"
+    )
 
     while True:
 
+        # proxy image is rebuilt when window is resized or full resolution is set
+        scale_now = get_window_scale(movie, W, H, full)
+        if scale_now != scale:
+            frame_cache.stop()
+            scale = scale_now
+            frame_cache = start_frame_cache(movie, points, loader, scale)
+            drawn_state = None
+        line_width = max(int(8 * scale), 1)
+
         frame = cv2.getTrackbarPos("frame\n", movie) * tick_s
         frame_s = cv2.getTrackbarPos("frame s\n", movie)
         frame_now = frame + frame_s if frame + frame_s < frames else frames
@@ -348,46 +1456,58 @@ def select_reference_length(
         if mm_per_line == 0:
             mm_per_line = 1
 
-        cap.set(cv2.CAP_PROP_POS_FRAMES, frame_now)
-        ret, img = cap.read()
+        # redraw only when frame, points, mm/line, message, or help is changed
+        state = (
+            frame_now, mm_per_line, tuple(points), tuple(warning_message), help_exists
+        )
+        if state != drawn_state:
+            if (drawn_state is None) or (frame_now != drawn_state[0]):
+                frame_cache.prefetch(get_prefetch_list(frame_now, frames, tick, tick_s))
+            drawn_state = state
+            img = frame_cache.get(frame_now).copy()
+
+            # points are selected in original scale, and drawn in proxy scale
+            proxy_points = [scale_point(point, scale) for point in points]
+
+            if len(points) == 1:
+                cv2.drawMarker(img, proxy_points[0], line_color, markerSize=10)
+            elif len(points) == 2:
+                cv2.drawMarker(img, proxy_points[0], line_color, markerSize=10)
+                cv2.drawMarker(img, proxy_points[1], line_color, markerSize=10)
+                cv2.line(img, proxy_points[0], proxy_points[1], line_color, line_width)
+            elif len(points) == 3:
+                points.clear()
+                warning_message = ["3rd is not accepted"]
 
-        if len(points) == 1:
-            cv2.drawMarker(img, points[0], line_color, markerSize=10)
-        elif len(points) == 2:
-            cv2.drawMarker(img, points[0], line_color, markerSize=10)
-            cv2.drawMarker(img, points[1], line_color, markerSize=10)
-            cv2.line(img, points[0], points[1], line_color, 8)
-        elif len(points) == 3:
-            points.clear()
-            warning_message = ["3rd is not accepted"]
-
-        if help_exists:
-            add_texts_lower_right(
-                img,
-                [
-                    "s:save if selected",
-                    "h:on/off help",
-                    "c:clear",
-                    "click:select",
-                    "q/esc:abort",
-                ],
-            )
-            add_texts_upper_left(
-                img,
-                [
-                    "[measure]",
-                    "select line and mm/pixel",
-                    "frame: {0}".format(frame_now),
-                    "mm/line: {0}".format(mm_per_line),
-                ],
-            )
-            add_texts_lower_left(img, warning_message)
-
-        cv2.imshow(movie, img)
+            if help_exists:
+                add_texts_lower_right(
+                    img,
+                    [
+                        "s:save if selected",
+                        "h:on/off help",
+                        "c:clear",
+                        "click:select",
+                        "f:full resolution",
+                        "q/esc:abort",
+                    ],
+                )
+                add_texts_upper_left(
+                    img,
+                    [
+                        "[measure]",
+                        "select line and mm/pixel",
+                        "frame: {0}".format(frame_now),
+                        "mm/line: {0}".format(mm_per_line),
+                    ],
+                )
+                add_texts_lower_left(img, warning_message)
+
+            cv2.imshow(movie, img)
         k = cv2.waitKey(1) & 0xFF
 
         if k == ord("s"):
             if len(points) == 2:
+                frame_cache.stop()
                 cv2.destroyAllWindows()
                 reference_length = math.sqrt(
                     (points[1][0] - points[0][0]) ** 2
@@ -417,25 +1537,37 @@ def select_reference_length(
                 help_exists = True
             continue
 
+        elif k == ord("f"):
+            full = not full
+            state_text = "on" if full else "off"
+            print("'f' is pressed. full resolution is {0}".format(state_text))
+            continue
+
         elif k == ord("q"):
+            frame_cache.stop()
             cv2.destroyAllWindows()
             print("'q' is pressed. abort")
             return None
 
         elif k == 27:
+            frame_cache.stop()
             cv2.destroyAllWindows()
             print("'Esq' is pressed. abort")
             return None
 
 
 def select_reference_place(
-    directory: str, picture_list: List[str]
+    directory: str,
+    picture_list: List[Any],
+    reader: Callable[..., Optional[numpy.array]] = read_binarized_picture,
 ) -> Optional[Tuple[int, Tuple[int, int], int]]:
     """select(get) three reference lines and threshold using GUI window
 
     Args:
         directory (str): directory name
-        picture_list (List[str]): picture list
+        picture_list (List[Any]): picture list (or keys of binarized frames)
+        reader (Callable[..., Optional[numpy.array]]): function reading binarized
+            frame from item of picture_list and 'scale' keyword
 
     Returns:
         Optional[int, Tuple[int, int], int]: bottom line for measurement, tube position lines, threshold % for determining if particles are filled or not
@@ -454,15 +1586,31 @@ def select_reference_place(
 
     points: List[Tuple[int, int]] = []
     warning_message: List[str] = []
-    cv2.setMouseCallback(directory, mouse_on_select_positions, points)
+    H, W = reader(picture_list[0]).shape[:2]
+    full = False
+    scale = get_window_scale(directory, W, H, full)
     white = 255
+    frame_cache = start_frame_cache(directory, points, reader, scale)
+    drawn_state: Optional[Tuple] = None
 
     print("--- measure ---")
     print("select three reference lines and threshold in GUI window!")
-    print("(s: save if selected, h:on/off help, c: clear, click: select, q/esc: abort)")
+    print(
+        "(s: save if selected, h:on/off help, c: clear, click: select, "
+        "f: on/off full resolution, q/esc: abort)"
+    )
 
     while True:
 
+        # proxy image is rebuilt when window is resized or full resolution is set
+        scale_now = get_window_scale(directory, W, H, full)
+        if scale_now != scale:
+            frame_cache.stop()
+            scale = scale_now
+            frame_cache = start_frame_cache(directory, points, reader, scale)
+            drawn_state = None
+        line_width = max(int(8 * scale), 1)
+
         frame = cv2.getTrackbarPos("frame\n", directory) * tick_s
         frame_s = cv2.getTrackbarPos("frame s\n", directory)
         frame_now = frame + frame_s if frame + frame_s < frames else frames
@@ -470,64 +1618,80 @@ def select_reference_place(
         if threshold == 0:
             threshold = 1
 
-        img = cv2.imread(picture_list[frame_now], cv2.IMREAD_GRAYSCALE)
-        W, H = img.shape[1], img.shape[0]
-
-        if len(points) == 1:
-            cv2.line(img, (0, points[0][1]), (W - 1, points[0][1]), white, 8)
-        elif len(points) == 2:
-            cv2.line(img, (0, points[0][1]), (W - 1, points[0][1]), white, 8)
-            cv2.line(img, (points[1][0], 0), (points[1][0], H - 1), white, 8)
-        elif len(points) == 3:
-            if points[2][0] <= points[1][0]:
-                points.clear()
-                warning_message = ["x_2 must be > x_1"]
-            else:
-                cut = img[: points[0][1], points[1][0] : points[2][0]]
-                for idx, y in enumerate(cut):
-                    white_size = numpy.count_nonzero(y)
-                    white_area = white_size / len(y) * 100.0
-                    if threshold <= white_area:
+        # redraw only when frame, points, threshold, message, or help is changed
+        state = (
+            frame_now, threshold, tuple(points), tuple(warning_message), help_exists
+        )
+        if state != drawn_state:
+            if (drawn_state is None) or (frame_now != drawn_state[0]):
+                prefetch_list = get_prefetch_list(frame_now, frames, tick, tick_s)
+                frame_cache.prefetch([picture_list[f] for f in prefetch_list])
+            drawn_state = state
+            img = frame_cache.get(picture_list[frame_now]).copy()
+            W_p, H_p = img.shape[1], img.shape[0]
+
+            # points are selected in original scale, and drawn in proxy scale
+            p = [scale_point(point, scale) for point in points]
+            width = line_width
+
+            if len(points) == 1:
+                cv2.line(img, (0, p[0][1]), (W_p - 1, p[0][1]), white, width)
+            elif len(points) == 2:
+                cv2.line(img, (0, p[0][1]), (W_p - 1, p[0][1]), white, width)
+                cv2.line(img, (p[1][0], 0), (p[1][0], H_p - 1), white, width)
+            elif len(points) == 3:
+                if points[2][0] <= points[1][0]:
+                    points.clear()
+                    warning_message = ["x_2 must be > x_1"]
+                else:
+                    cut = img[: p[0][1], p[1][0] : p[2][0]]
+                    filled_row = get_filled_row(cut, threshold)
+                    if filled_row is not None:
                         cv2.line(
-                            img, (points[1][0], idx), (points[2][0], idx), white, 8
+                            img,
+                            (p[1][0], filled_row),
+                            (p[2][0], filled_row),
+                            white,
+                            width,
                         )
-                        break
 
-                cv2.line(img, (0, points[0][1]), (W - 1, points[0][1]), white, 8)
-                cv2.line(img, (points[1][0], 0), (points[1][0], H - 1), white, 8)
-                cv2.line(img, (points[2][0], 0), (points[2][0], H - 1), white, 8)
+                    cv2.line(img, (0, p[0][1]), (W_p - 1, p[0][1]), white, width)
+                    cv2.line(img, (p[1][0], 0), (p[1][0], H_p - 1), white, width)
+                    cv2.line(img, (p[2][0], 0), (p[2][0], H_p - 1), white, width)
 
-        elif len(points) == 4:
-            points.clear()
-            warning_message = ["4th is not accepted"]
-
-        if help_exists:
-            add_texts_lower_right(
-                img,
-                [
-                    "s:save if selected",
-                    "h:on/off help",
-                    "c:clear",
-                    "click:select",
-                    "q/esc:abort",
-                ],
-            )
-            add_texts_upper_left(
-                img,
-                [
-                    "[measure]",
-                    "select area",
-                    "frame: {0}".format(frame_now),
-                    "threshold: {0}%".format(threshold),
-                ],
-            )
-            add_texts_lower_left(img, warning_message)
-
-        cv2.imshow(directory, img)
+            elif len(points) == 4:
+                points.clear()
+                warning_message = ["4th is not accepted"]
+
+            if help_exists:
+                add_texts_lower_right(
+                    img,
+                    [
+                        "s:save if selected",
+                        "h:on/off help",
+                        "c:clear",
+                        "click:select",
+                        "f:full resolution",
+                        "q/esc:abort",
+                    ],
+                )
+                add_texts_upper_left(
+                    img,
+                    [
+                        "[measure]",
+                        "select area",
+                        "frame: {0}".format(frame_now),
+                        "threshold: {0}%".format(threshold),
+                    ],
+                )
+                add_texts_lower_left(img, warning_message)
+
+            cv2.imshow(directory, img)
         k = cv2.waitKey(1) & 0xFF
 
         if k == ord("s"):
             if len(points) == 3:
+                frame_cache.stop()
                 cv2.destroyAllWindows()
                 print(
                     "'s' is pressed. area and threshold are saved ({0},{1},{2})".format(
@@ -553,157 +1717,22 @@ def select_reference_place(
                 help_exists = True
             continue
 
+        elif k == ord("f"):
+            full = not full
+            state_text = "on" if full else "off"
+            print("'f' is pressed. full resolution is {0}".format(state_text))
+            continue
+
         elif k == ord("q"):
+            frame_cache.stop()
             cv2.destroyAllWindows()
             print("'q' is pressed. abort")
             return None
 
         elif k == 27:
+            frame_cache.stop()
             cv2.destroyAllWindows()
             print("'Esq' is pressed. abort")
             return None
 
 
-def graph(movie_list: List[str]):
-    """visualize measured height"""
-
-    cv2_path = pathlib.Path(pathlib.Path.cwd() / "cv2")
-    input_list: List[str] = []
-
-    for movie in movie_list:
-
-        if ("_height.csv" in movie) and (pathlib.Path(movie).is_file()):
-            input_list.append(movie)
-
-        else:
-            movie_path = pathlib.Path(movie)
-            movie_stem = movie_path.stem
-            height_file = "{0}_height.csv".format(movie_stem)
-
-            if (movie_path.is_file()) and (imghdr.what(movie) is None):
-                measured_path = pathlib.Path(
-                    cv2_path / movie_stem / "measured" / height_file
-                )
-                if measured_path.is_file():
-                    input_list.append(str(measured_path))
-
-    for input in input_list:
-        graph_single(input)
-
-    if len(input_list) >= 2:
-        graph_multiple(input_list)
-
-
-def graph_multiple(input_list):
-    """visualize measured height"""
-    fig_stem = "__".join(
-        [pathlib.Path(i).stem.strip("_height")[:10] for i in input_list]
-    )
-    fig_name = pathlib.Path(pathlib.Path.cwd() / "cv2" / "{0}.png".format(fig_stem))
-
-    pyplot.rcParams["xtick.direction"] = "in"
-    pyplot.rcParams["ytick.direction"] = "in"
-    pyplot.figure(figsize=(4.5, 3), dpi=300)
-
-    for input in input_list:
-        with open(input) as f:
-
-            reader = csv.reader(f)
-            time_list = []
-            height_list = []
-
-            for idx, data in enumerate(reader):
-
-                if idx == 0:
-                    continue
-
-                time_list.append(float(data[0]))
-                height_list.append(float(data[1]))
-
-            if not time_list:
-                print("no data exists in {0}!".format(input))
-                return
-
-            label_name = pathlib.Path(input).stem.strip("_height")
-            pyplot.plot(time_list, height_list, label=label_name)
-
-    pyplot.xlabel("time  $\it{s}$")
-    pyplot.ylabel("climbing height $\it{mm}$")
-    pyplot.xlim(xmin=0)
-    # pyplot.xticks([0, 100, 200, 300], [0, 100, 200, 300], rotation=0)
-    pyplot.ylim(ymin=0)
-    # pyplot.yticks([0,250,500,750,1000], [0,250,500,750,1000], rotation=0)
-    pyplot.grid(which="minor")
-    pyplot.legend(bbox_to_anchor=(1, 1.01), loc="lower right", borderaxespad=0)
-    pyplot.savefig(fig_name, bbox_inches="tight")
-    # pyplot.show()
-    pyplot.close()
-    generate_script_multiple_data(input_list)
-
-
-def graph_single(input):
-    """visualize measured height"""
-    file_name = input
-    fig_name = file_name.replace(".csv", ".png")
-
-    with open(file_name) as f:
-
-        reader = csv.reader(f)
-        time_list = []
-        height_list = []
-
-        for idx, data in enumerate(reader):
-
-            if idx == 0:
-                continue
-
-            time_list.append(float(data[0]))
-            height_list.append(float(data[1]))
-
-        if not time_list:
-            print("no data exists in {0}!".format(file_name))
-            return
-
-        pyplot.rcParams["xtick.direction"] = "in"
-        pyplot.rcParams["ytick.direction"] = "in"
-        pyplot.figure(figsize=(4.5, 3), dpi=300)
-        pyplot.plot(time_list, height_list)
-        pyplot.xlabel("time  $\it{s}$")
-        pyplot.ylabel("climbing height $\it{mm}$")
-        pyplot.xlim(xmin=0)
-        # pyplot.xticks([0, 100, 200, 300], [0, 100, 200, 300], rotation=0)
-        pyplot.ylim(ymin=0)
-        # pyplot.yticks([0,250,500,750,1000], [0,250,500,750,1000], rotation=0)
-        pyplot.grid(which="minor")
-        pyplot.savefig(fig_name, bbox_inches="tight")
-        # pyplot.show()
-        pyplot.close()
-        generate_script_single_data(file_name)
-
-
-def generate_script_multiple_data(file_list: List[str]):
-
-    text_1 = "import csv\nimport pathlib\nfrom matplotlib import pyplot\n\n\n"
-    text_1 += inspect.getsource(graph_multiple)
-    text_2 = text_1.rstrip("generate_script_multiple_data(input_list)\n")
-    text_2 += "\n\ninput_list = ["
-    for file in file_list:
-        text_2 += "\n  r'{0}',".format(file)
-    text_2 += "\n]"
-    text_2 += "\ngraph_multiple(input_list)\n"
-    fig_stem = "__".join(
-        [pathlib.Path(f).stem.strip("_height")[:10] for f in file_list]
-    )
-    helper_path = pathlib.Path(pathlib.Path.cwd() / "cv2" / "{0}.py".format(fig_stem))
-    helper_path.write_text(text_2)
-
-
-def generate_script_single_data(file: str):
-
-    text_1 = "import csv\nimport pathlib\nfrom matplotlib import pyplot\n\n\n"
-    text_1 += inspect.getsource(graph_single)
-    text_2 = text_1.rstrip("generate_script_single_data(file_name)\n")
-    text_3 = text_2 + "\n\ninput = r'{0}'".format(file)
-    text_4 = text_3 + "\ngraph_single(input)"
-    helper_path = pathlib.Path(file.replace(".csv", ".py"))
-    helper_path.write_text(text_4 + "\n")
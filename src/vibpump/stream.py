@@ -0,0 +1,503 @@
+"""stream module containing image process functions executed in memory
+
+frames flow through chained processes as numpy arrays (generator pipeline),
+and only output of selected processes is written in 'cv2' directory.
+"""
+
+import cv2
+import functools
+import numpy
+import pathlib
+from vibpump import height
+from vibpump import image
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+Frame = Tuple[float, numpy.array]
+Process = Tuple[str, Callable[[numpy.array], numpy.array]]
+# frames, keys of frames, reader of frame from key, and offset (x, y) of input
+Source = Tuple[Iterator[Frame], List[Any], Callable[..., numpy.array], Tuple[int, int]]
+
+# output directory name of each process (same as '--type' of cli)
+output_type = {
+    "--capture": "captured",
+    "--rotate": "rotated",
+    "--crop": "cropped",
+    "--binarize": "binarized",
+}
+
+
+def rotate_frame(frame: numpy.array, degree: float) -> numpy.array:
+    """rotate frame around center (counterclockwise, size is kept)
+
+    Args:
+        frame (numpy.array): cv2 image object
+        degree (float): rotation angle
+
+    Returns:
+        numpy.array: rotated image
+    """
+    H, W = frame.shape[0], frame.shape[1]
+    matrix = cv2.getRotationMatrix2D((W / 2, H / 2), degree, 1.0)
+    return cv2.warpAffine(frame, matrix, (W, H))
+
+
+def crop_frame(frame: numpy.array, area: Tuple[int, int, int, int]) -> numpy.array:
+    """crop frame
+
+    Args:
+        frame (numpy.array): cv2 image object
+        area (Tuple[int, int, int, int]): x1, y1, x2, y2 of area to be cropped
+
+    Returns:
+        numpy.array: cropped image
+    """
+    return frame[area[1] : area[3], area[0] : area[2]]
+
+
+def binarize_frame(frame: numpy.array, threshold: int) -> numpy.array:
+    """binarize frame (frame is converted to gray scale first)
+
+    Args:
+        frame (numpy.array): cv2 image object
+        threshold (int): threshold (0-255) of binarization
+
+    Returns:
+        numpy.array: binarized image
+    """
+    if frame.ndim == 3:
+        frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    ret, binarized = cv2.threshold(frame, threshold, 255, cv2.THRESH_BINARY)
+    return binarized
+
+
+def get_process_list(
+    opt_args: List[str],
+    degree: Optional[float],
+    area: Optional[List[int]],
+    threshold: Optional[int],
+) -> Optional[List[Process]]:
+    """get processes executed in memory in order of arguments
+
+    Args:
+        opt_args (List[str]): cli arguments
+        degree (Optional[float]): rotation angle for '--rotate'
+        area (Optional[List[int]]): x1, y1, x2, y2 of area for '--crop'
+        threshold (Optional[int]): threshold (0-255) for '--binarize'
+
+    Returns:
+        Optional[List[Process]]: list of process name and function
+    """
+    process_list: List[Process] = []
+
+    for opt in opt_args:
+        if opt == "--capture":
+            if process_list:
+                print("'--capture' must be executed first!")
+                return None
+            process_list.append((opt, lambda frame: frame))
+        elif opt == "--rotate":
+            if degree is None:
+                print("'--degree' is required for '--rotate' in stream mode!")
+                return None
+            process_list.append((opt, functools.partial(rotate_frame, degree=degree)))
+        elif opt == "--crop":
+            if area is None:
+                print("'--area' is required for '--crop' in stream mode!")
+                return None
+            crop = functools.partial(crop_frame, area=tuple(area))
+            process_list.append((opt, crop))
+        elif opt == "--binarize":
+            if threshold is None:
+                print("'--binarize-threshold' is required for '--binarize' in stream!")
+                return None
+            binarize = functools.partial(binarize_frame, threshold=threshold)
+            process_list.append((opt, binarize))
+        elif opt == "--clip":
+            print("'--clip' is not supported in stream mode!")
+            return None
+
+    return process_list
+
+
+def apply_process(
+    frame: Optional[numpy.array], process_list: List[Process]
+) -> Optional[numpy.array]:
+    """apply processes to one frame
+
+    Args:
+        frame (Optional[numpy.array]): cv2 image object
+        process_list (List[Process]): list of process name and function
+
+    Returns:
+        Optional[numpy.array]: processed image (None if frame is None)
+    """
+    if frame is None:
+        return None
+    for name, process in process_list:
+        frame = process(frame)
+    return frame
+
+
+def generate_movie_frames(
+    movie: str,
+    stride: int = 1,
+    start: Optional[float] = None,
+    end: Optional[float] = None,
+) -> Iterator[Frame]:
+    """read frames of movie one by one
+
+    movie is seeked to near start time (see image.seek_frames), and frames out of
+    selection (see image.sample_frames) are grabbed, but not retrieved (converted).
+
+    Args:
+        movie (str): movie file name
+        stride (int): interval of frames
+        start (Optional[float]): start time (s)
+        end (Optional[float]): end time (s)
+
+    Yields:
+        Iterator[Frame]: time (s) and frame
+    """
+    cap = cv2.VideoCapture(movie)
+    grabbed = image.seek_frames(cap, start)
+    for time, idx in image.sample_frames(grabbed, stride, start, end):
+        ret, frame = cap.retrieve()
+        if not ret:
+            break
+        yield (time, frame)
+    cap.release()
+
+
+def generate_picture_frames(picture_list: List[Tuple[float, str]]) -> Iterator[Frame]:
+    """read pictures one by one
+
+    Args:
+        picture_list (List[Tuple[float, str]]): list of time (s) and picture
+
+    Yields:
+        Iterator[Frame]: time (s) and frame
+    """
+    for time, picture in picture_list:
+        yield (time, cv2.imread(picture, cv2.IMREAD_UNCHANGED))
+
+
+def save_frames(frames: Iterator[Frame], directory: str, stem: str) -> Iterator[Frame]:
+    """write frames as pictures while passing them to the next process
+
+    Args:
+        frames (Iterator[Frame]): time (s) and frame
+        directory (str): output directory
+        stem (str): stem of picture name
+
+    Yields:
+        Iterator[Frame]: time (s) and frame (same as input)
+    """
+    pathlib.Path(directory).mkdir(parents=True, exist_ok=True)
+    for time, frame in frames:
+        name = "{0}_{1:09d}.png".format(stem, int(round(time * 1000)))
+        cv2.imwrite(str(pathlib.Path(directory) / name), frame)
+        yield (time, frame)
+
+
+def read_frame(
+    cap: cv2.VideoCapture, frame: int, process_list: List[Process], scale: float = 1.0
+) -> Optional[numpy.array]:
+    """read one frame of movie and apply processes (used in GUI window)
+
+    Args:
+        cap (cv2.VideoCapture): cv2 video object
+        frame (int): frame number
+        process_list (List[Process]): list of process name and function
+        scale (float): scale of image to be returned
+
+    Returns:
+        Optional[numpy.array]: processed image (None if frame cannot be read)
+    """
+    img = apply_process(image.read_movie_frame(cap, frame), process_list)
+    if img is None:
+        return None
+    return image.resize_proxy(img, scale, cv2.INTER_NEAREST)
+
+
+def read_picture(
+    picture: str, process_list: List[Process], scale: float = 1.0
+) -> Optional[numpy.array]:
+    """read one picture and apply processes (used in GUI window)
+
+    Args:
+        picture (str): picture path
+        process_list (List[Process]): list of process name and function
+        scale (float): scale of image to be returned
+
+    Returns:
+        Optional[numpy.array]: processed image (None if picture cannot be read)
+    """
+    img = apply_process(cv2.imread(picture, cv2.IMREAD_UNCHANGED), process_list)
+    if img is None:
+        return None
+    return image.resize_proxy(img, scale, cv2.INTER_NEAREST)
+
+
+def measure(
+    frames: Iterator[Frame],
+    output: str,
+    calibration: Dict[str, Any],
+    batch_size: int,
+    subpixel: int = 0,
+    track: int = 0,
+):
+    """measure climbing height of binarized frames and write .csv (or .npy) file
+
+    Args:
+        frames (Iterator[Frame]): time (s) and binarized frame
+        output (str): output file (_height.csv or _height.npy)
+        calibration (Dict[str, Any]): mm_per_pixel, bottom, tube_pos, threshold
+        batch_size (int): number of frames measured at once
+        subpixel (int): number of rows smoothed in sub-pixel detection
+            (see image.get_filled_edges, disabled if 0)
+        track (int): half width of band searched around front of the previous
+            frames (see image.detect_filled_rows, disabled if 0)
+    """
+    pathlib.Path(output).parent.mkdir(parents=True, exist_ok=True)
+    image.save_height_calibration(output, calibration, subpixel, track)
+    batches = measure_batches(frames, calibration, batch_size, subpixel, track)
+    height.save_height(output, batches)
+
+
+def measure_batches(
+    frames: Iterator[Frame],
+    calibration: Dict[str, Any],
+    batch_size: int,
+    subpixel: int = 0,
+    track: int = 0,
+) -> Iterator[Tuple[List[float], List[float]]]:
+    """measure climbing height of binarized frames batch by batch
+
+    Args:
+        frames (Iterator[Frame]): time (s) and binarized frame
+        calibration (Dict[str, Any]): mm_per_pixel, bottom, tube_pos, threshold
+        batch_size (int): number of frames measured at once
+        subpixel (int): number of rows smoothed in sub-pixel detection
+        track (int): half width of band searched in tracking
+
+    Yields:
+        Iterator[Tuple[List[float], List[float]]]: time (s) and height (mm)
+    """
+    batch_size = max(batch_size, 1)
+    frame_list: List[Frame] = []
+    measure_frames = functools.partial(
+        image.measure_frames, subpixel=subpixel, track=track, **calibration
+    )
+
+    for frame in frames:
+        frame_list.append(frame)
+        if batch_size <= len(frame_list):
+            yield measure_frames(frame_list)
+            frame_list.clear()
+
+    if frame_list:
+        yield measure_frames(frame_list)
+
+
+def process_frames(
+    frames: Iterator[Frame], function: Callable[[numpy.array], numpy.array]
+) -> Iterator[Frame]:
+    """apply one process to frames one by one
+
+    Args:
+        frames (Iterator[Frame]): time (s) and frame
+        function (Callable[[numpy.array], numpy.array]): process function
+
+    Yields:
+        Iterator[Frame]: time (s) and processed frame
+    """
+    for time, frame in frames:
+        yield (time, function(frame))
+
+
+def crop_tube_area(
+    frames: Iterator[Frame], calibration: Dict[str, Any]
+) -> Iterator[Frame]:
+    """crop frames to tube area used in measurement
+
+    Args:
+        frames (Iterator[Frame]): time (s) and frame
+        calibration (Dict[str, Any]): mm_per_pixel, bottom, tube_pos, threshold
+
+    Returns:
+        Iterator[Frame]: time (s) and cropped frame
+    """
+    bottom, tube_pos = calibration["bottom"], calibration["tube_pos"]
+    area = (tube_pos[0], 0, tube_pos[1], bottom)
+    return process_frames(frames, functools.partial(crop_frame, area=area))
+
+
+def get_source(
+    movie: str,
+    input_type: Optional[str],
+    process_list: List[Process],
+    stride: int = 1,
+    start: Optional[float] = None,
+    end: Optional[float] = None,
+) -> Optional[Source]:
+    """get input frames of movie and reader of them for GUI window
+
+    Args:
+        movie (str): movie file
+        input_type (Optional[str]): type of pre-processed directory given as input
+            (movie itself is given as input if None)
+        process_list (List[Process]): list of process name and function
+        stride (int): interval of frames (see image.sample_frames)
+        start (Optional[float]): start time (s)
+        end (Optional[float]): end time (s)
+
+    Returns:
+        Optional[Source]: frames (not read until iterated), keys of frames, reader
+            of a frame processed by process_list from key, and offset (x, y) of
+            pictures (None if input does not exist)
+    """
+    if input_type is None:
+        cap = cv2.VideoCapture(movie)
+        W, H, last_frame, fps = image.get_movie_info(cap, movie)
+        key_list: List[Any] = list(range(last_frame + 1))
+        reader = functools.partial(read_frame, cap, process_list=process_list)
+        frames = generate_movie_frames(movie, stride, start, end)
+        return (frames, key_list, reader, (0, 0))
+
+    cv2_path = pathlib.Path(pathlib.Path.cwd() / "cv2")
+    directory = str(cv2_path / pathlib.Path(movie).stem / input_type)
+    if not pathlib.Path(directory).is_dir():
+        print("'{0}' does not exist!".format(directory))
+        return None
+
+    picture_list = image.get_picture_list(directory)
+    if not picture_list:
+        print("no file exists in '{0}'!".format(directory))
+        return None
+
+    key_list = [picture for time, picture in picture_list]
+    reader = functools.partial(read_picture, process_list=process_list)
+    offset = image.load_picture_offset(directory, picture_list[0][1])
+    picture_list = list(image.sample_frames(picture_list, stride, start, end))
+    return (generate_picture_frames(picture_list), key_list, reader, offset)
+
+
+def process(
+    movie_list: List[str],
+    input_type: Optional[str],
+    process_list: List[Process],
+    save_list: List[str],
+    measure_enabled: bool,
+    calibration_mode: str = "force",
+    batch_size: int = 256,
+    output_format: str = "csv",
+    subpixel: int = 0,
+    track: int = 0,
+    stride: int = 1,
+    start: Optional[float] = None,
+    end: Optional[float] = None,
+) -> List[str]:
+    """execute chained processes in memory for each movie
+
+    output of the last process (and processes in save_list) is written in
+    'cv2/movie-noExtension/process-type' directory. if measure is enabled,
+    climbing height is measured from output of the last process, which must
+    be binarized frame, and only .csv (or .npy) file is written by default.
+
+    Args:
+        movie_list (List[str]): list of movie
+        input_type (Optional[str]): type of pre-processed directory given as input
+            (movie itself is given as input if None)
+        process_list (List[Process]): list of process name and function
+        save_list (List[str]): types of process whose output is written
+        measure_enabled (bool): whether measure is executed at the end
+        calibration_mode (str): 'reuse', 'force' or 'stored'
+        batch_size (int): number of frames measured at once
+        output_format (str): 'csv' (_height.csv) or 'npy' (_height.npy)
+        subpixel (int): number of rows smoothed in sub-pixel detection
+        track (int): half width of band searched in tracking
+        stride (int): interval of frames (see image.sample_frames)
+        start (Optional[float]): start time (s)
+        end (Optional[float]): end time (s)
+
+    Returns:
+        List[str]: list of output (directory or .csv/.npy file)
+    """
+    cv2_path = pathlib.Path(pathlib.Path.cwd() / "cv2")
+    output_list: List[str] = []
+
+    if measure_enabled:
+        last_type = output_type[process_list[-1][0]] if process_list else input_type
+        if last_type != "binarized":
+            print("'--measure' requires binarized frame in stream mode!")
+            return output_list
+
+    for movie in movie_list:
+
+        stem = pathlib.Path(movie).stem
+        source = get_source(movie, input_type, process_list, stride, start, end)
+        if source is None:
+            continue
+        frames, key_list, reader, offset = source
+
+        if measure_enabled:
+            calibration = image.calibrate(
+                movie,
+                "{0} (stream)".format(movie),
+                key_list,
+                calibration_mode,
+                reader,
+                offset,
+            )
+            if calibration is None:
+                continue
+            calibration = image.shift_calibration(calibration, offset)
+            img = reader(key_list[0])
+            if (img is None) or (
+                not image.check_tube_area(calibration, img.shape, movie)
+            ):
+                continue
+
+        # binarization is pixel-wise, so only tube area is binarized, written (with
+        # offset), and measured if height is measured
+        roi_enabled = (
+            measure_enabled
+            and bool(process_list)
+            and (process_list[-1][0] == "--binarize")
+        )
+
+        for idx, (name, function) in enumerate(process_list):
+            is_roi = roi_enabled and (idx == len(process_list) - 1)
+            if is_roi:
+                frames = crop_tube_area(frames, calibration)
+            frames = process_frames(frames, function)
+            is_last = (idx == len(process_list) - 1) and (not measure_enabled)
+            if (output_type[name] in save_list) or is_last:
+                directory = str(cv2_path / stem / output_type[name])
+                frames = save_frames(frames, directory, stem)
+                if is_roi:
+                    bottom, tube_pos = calibration["bottom"], calibration["tube_pos"]
+                    image.save_picture_offset(
+                        directory,
+                        (offset[0] + tube_pos[0], offset[1]),
+                        (bottom, tube_pos[1] - tube_pos[0]),
+                    )
+                else:
+                    image.save_picture_offset(directory, None)
+                if is_last:
+                    output_list.append(directory)
+
+        if roi_enabled:
+            tube_pos = calibration["tube_pos"]
+            calibration = image.shift_calibration(calibration, (tube_pos[0], 0))
+
+        if measure_enabled:
+            output_name = "{0}_height.{1}".format(stem, output_format)
+            output = str(cv2_path / stem / "measured" / output_name)
+            measure(frames, output, calibration, batch_size, subpixel, track)
+            output_list.append(output)
+        else:
+            for frame in frames:
+                pass
+
+    return output_list
@@ -0,0 +1,43 @@
+"""tests of measured height file and graph helpers of height module"""
+import numpy
+import pytest
+from vibpump import height
+
+
+@pytest.mark.parametrize("n", [8000, 8001, 12345])
+def test_decimate_height_keeps_end_points_and_peaks(n):
+    time_list = numpy.arange(n) * 0.1
+    height_list = numpy.sin(time_list)
+
+    t, h = height.decimate_height(time_list, height_list)
+
+    assert t[0] == time_list[0]
+    assert t[-1] == time_list[-1]
+    assert numpy.all(numpy.diff(t) > 0)
+    assert h.max() == height_list.max()
+    assert h.min() == height_list.min()
+
+
+def test_get_measured_time_removes_truncated_line(tmp_path):
+    output = str(tmp_path / "m_height.csv")
+    height.save_height(output, [([0.0, 0.033, 0.067], [1.0, 2.0, 3.0])])
+    with open(output, "a") as f:
+        f.write("0.1,4.")  # process was killed while writing
+
+    measured_time = height.get_measured_time(output)
+
+    numpy.testing.assert_allclose(measured_time, [0.0, 0.033, 0.067])
+    height.save_height(output, [([0.1], [4.0])], append=True)
+    numpy.testing.assert_allclose(height.load_height(output)[1], [1, 2, 3, 4])
+
+
+@pytest.mark.parametrize("suffix", [".csv", ".npy"])
+def test_sort_height(tmp_path, suffix):
+    output = str(tmp_path / ("m_height" + suffix))
+    height.save_height(output, [([0.2, 0.0], [3.0, 1.0]), ([0.1], [2.0])])
+
+    height.sort_height(output)
+
+    time_list, height_list = height.load_height(output)
+    numpy.testing.assert_allclose(time_list, [0.0, 0.1, 0.2])
+    numpy.testing.assert_allclose(height_list, [1.0, 2.0, 3.0])
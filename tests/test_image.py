@@ -0,0 +1,70 @@
+"""tests of height detection of image module"""
+import numpy
+import pytest
+from vibpump import image
+
+
+def get_filled_row_loop(cut: numpy.array, threshold: int, default: int) -> int:
+    """per-row loop used in measure before height detection was vectorized"""
+    for idx, y in enumerate(cut):
+        white_area = numpy.count_nonzero(y) / len(y) * 100.0
+        if threshold <= white_area:
+            return idx
+    return default
+
+
+def create_fronts(rng: numpy.random.Generator, N: int, H: int, W: int, speed: float):
+    """create binarized images filled from front (with speckles) moving upward"""
+    images = (rng.random((N, H, W)) < 0.05).astype(numpy.uint8) * 255
+    front = (H - 10 - numpy.arange(N) * speed + rng.normal(0, 1, N)).astype(int)
+    for idx, row in enumerate(numpy.clip(front, 0, H)):
+        images[idx, row:] = 255
+    return images
+
+
+@pytest.mark.parametrize("threshold", [1, 30, 50, 100])
+def test_get_filled_rows_matches_loop(threshold):
+    rng = numpy.random.default_rng(threshold)
+    images = (rng.random((64, 40, 7)) < 0.4).astype(numpy.uint8) * 255
+    expected = [get_filled_row_loop(img, threshold, 40) for img in images]
+
+    rows = image.get_filled_rows(images, threshold, 40)
+
+    assert rows.tolist() == expected
+
+
+def test_get_filled_row_none_if_not_filled():
+    assert image.get_filled_row(numpy.zeros((10, 5), numpy.uint8), 50) is None
+
+
+@pytest.mark.parametrize("subpixel", [0, 1, 5])
+@pytest.mark.parametrize("speed", [0.0, 0.5, 3.0])
+def test_detect_filled_rows_tracking_matches_full_scan(subpixel, speed):
+    rng = numpy.random.default_rng(int(speed * 10) + subpixel)
+    images = create_fronts(rng, 100, 300, 20, speed)
+    images[40:45] = 0  # frames where no row is filled
+
+    full = image.detect_filled_rows(images, 50, 300, subpixel, 0)
+    tracked = image.detect_filled_rows(images, 50, 300, subpixel, 15)
+
+    # sub-pixel edge may differ in rounding, since moving average is cut by band
+    numpy.testing.assert_allclose(tracked, full, rtol=0, atol=1e-9)
+
+
+@pytest.mark.parametrize("window", [1, 3, 5])
+def test_get_filled_edges_sharp_fill_gives_row(window):
+    images = numpy.zeros((3, 50, 10), numpy.uint8)
+    for idx, row in enumerate([10, 25, 40]):
+        images[idx, row:] = 255
+
+    edges = image.get_filled_edges(images, 50, 50, window)
+
+    numpy.testing.assert_allclose(edges, [10, 25, 40])
+
+
+def test_get_filled_edges_ignores_speckle_row():
+    images = numpy.zeros((1, 50, 10), numpy.uint8)
+    images[0, 10] = 255
+    images[0, 30:] = 255
+
+    assert image.get_filled_edges(images, 50, 50, 5)[0] == pytest.approx(30)